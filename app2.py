@@ -1,15 +1,14 @@
-import sqlite3
 import threading
-import multiprocessing
-import requests
 import logging
 import csv
 import random
-import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
 from collections import defaultdict # Добавьте эту строку в начало файла 
 
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QLineEdit, QTableWidget, QTableWidgetItem, QVBoxLayout, QHBoxLayout, QMessageBox, QInputDialog, QFileDialog, QMainWindow, QAction, QComboBox, QSpinBox, QTabWidget, QTextEdit, QMenu, QTableView, QSplitter
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QModelIndex, QTimer
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal, QModelIndex, QTimer, QAbstractTableModel, QItemSelectionModel
 from PyQt5.QtGui import QColor, QKeySequence
 from PyQt5.QtWidgets import QAbstractItemView
 
@@ -22,238 +21,9 @@ import threading
 # Настройка логирования
 #logging.basicConfig(filename='app.log', level=print, format='%(asctime)s - %(levelname)s - %(message)s')
 
+from core import ACCOUNT_COLUMNS, AccountManager, DatabaseManager, RateThrottle, SharedCounters, TaskManager, new_owner, read_settings
 
 
-
-class DatabaseManager:
-    def __init__(self, db_file: str):
-        self.db_file = db_file
-        self.conn = None
-
-    def connect(self):
-        try:
-            self.conn = sqlite3.connect(self.db_file)
-        except sqlite3.Error as e:
-            print(f"Database connection error: {e}")
-
-    def create_audience_table(self, conn, audience_name: str):
-        try:
-            c = conn.cursor()
-            table_name = f"audience_{audience_name}"
-            c.execute(f"""
-                CREATE TABLE IF NOT EXISTS {table_name} (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    audience_name TEXT NOT NULL,
-                    total_audience_count INTEGER NOT NULL,
-                    processed_audience_count INTEGER NOT NULL,
-                    audience_date TEXT NOT NULL
-                )
-            """)
-            conn.commit()
-            print(f"Table '{table_name}' created.")
-        except sqlite3.Error as e:
-            print(f"Error creating table: {e}")
-
-
-
-    def add_column(self, table_name: str, column_name: str, column_type: str) -> None:
-        """
-        Добавляет новую колонку в таблицу.
-
-        Args:
-            table_name (str): Имя таблицы.
-            column_name (str): Имя новой колонки.
-            column_type (str): Тип данных новой колонки.
-        """
-        try:
-            c = self.conn.cursor()
-            c.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
-            self.conn.commit()
-            print(f"Колонка '{column_name}' добавлена в таблицу '{table_name}'.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при добавлении колонки '{column_name}': {e}")
-
-
-    def create_table(self, table_name: str) -> None:
-        """
-        Создает таблицу в базе данных.
-
-        Args:
-            table_name (str): Имя таблицы.
-        """
-        try:
-            c = self.conn.cursor()
-            c.execute(f"""
-                CREATE TABLE IF NOT EXISTS {table_name} (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT,
-                    password TEXT,
-                    ua TEXT,
-                    cookie TEXT,
-                    device TEXT,
-                    status_account TEXT,
-                    messages_total INTEGER,
-                    messages_day INTEGER,
-                    messages_run INTEGER,
-                    color TEXT
-                )
-            """)
-            self.conn.commit()
-            print(f"Таблица '{table_name}' создана.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при создании таблицы: {e}")
-
-    def add_account(self, table_name: str, account: dict) -> None:
-        """
-        Добавляет аккаунт в таблицу.
-
-        Args:
-            table_name (str): Имя таблицы.
-            account (dict): Словарь с данными аккаунта.
-        """
-        try:
-            c = self.conn.cursor()
-            c.execute(f"""
-                INSERT INTO '{table_name}' (username, password, ua, cookie, device, status_account, messages_total, messages_day, messages_run, color)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (account['username'], account['password'], account.get('ua', ''), account.get('cookie', ''), account.get('device', ''), 'Не проверено', 0, 0, 0, ''))
-            self.conn.commit()
-            print(f"Аккаунт '{account['username']}' добавлен в таблицу '{table_name}'.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при добавлении аккаунта: {e}")
-
-    def get_accounts(self, table_name: str) -> list:
-        """
-        Получает список всех аккаунтов из таблицы.
-
-        Args:
-            table_name (str): Имя таблицы.
-
-        Returns:
-            list: Список словарей с данными аккаунтов.
-        """
-        try:
-            c = self.conn.cursor()
-            c.execute(f"SELECT * FROM '{table_name}'")
-            rows = c.fetchall()
-            accounts = [dict(zip([column[0] for column in c.description], row)) for row in rows]
-            print(f"Список аккаунтов из таблицы '{table_name}' получен.")
-            return accounts
-        except sqlite3.Error as e:
-            print(f"Ошибка при получении списка аккаунтов: {e}")
-            return []
-
-    def update_account_status(self, table_name: str, account: dict):
-        try:
-            c = self.conn.cursor()
-            # Проверка занятости аккаунта
-            if account['status_account'] == 'В процессе':
-                print(f"Аккаунт '{account['username']}' уже выполняет задачу.")
-                return
-            
-            status = 'Валидный' if random.randint(1, 2) == 1 else 'Невалидный'
-            color = 'lightgreen' if status == 'Валидный' else 'lightcoral'
-            
-            c.execute(f"UPDATE '{table_name}' SET status_account = ?, color = ? WHERE id = ?", (status, color, account['id']))
-            self.conn.commit()
-            print(f"Статус аккаунта '{account['username']}' обновлен в таблице '{table_name}'.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при обновлении статуса аккаунта: {e}")
-
-    def delete_table(self, table_name: str) -> None:
-        """
-        Удаляет таблицу из базы данных.
-
-        Args:
-            table_name (str): Имя таблицы.
-        """
-        try:
-            c = self.conn.cursor()
-            c.execute(f"DROP TABLE '{table_name}'")
-            self.conn.commit()
-            print(f"Таблица '{table_name}' удалена.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при удалении таблицы: {e}")
-
-    def check_account_status(self, account: dict) -> str:
-        """
-        Проверяет статус аккаунта (временная функция).
-
-        Args:
-            account (dict): Словарь с данными аккаунта.
-
-        Returns:
-            str: Статус аккаунта ("Валидный" или "Невалидный").
-        """
-        status = "Валидный" if random.randint(1, 2) == 1 else "Невалидный"
-        return status
-
-    def add_audience_id(self, table_name, audience_id):
-        self.cursor.execute(f"INSERT INTO parsed_audience (audience_id) VALUES (?)", (audience_id,))
-        self.connection.commit()
-    def get_audience_ids(self, table_name: str) -> list:
-        """
-        Получает список всех ID аудитории из таблицы.
-
-        Args:
-            table_name (str): Имя таблицы.
-
-        Returns:
-            list: Список ID аудитории.
-        """
-        try:
-            c = self.conn.cursor()
-            c.execute(f"SELECT id FROM '{table_name}'")
-            rows = c.fetchall()
-            audience_ids = [row[0] for row in rows]
-            print(f"Список ID аудитории из таблицы '{table_name}' получен.")
-            return audience_ids
-        except sqlite3.Error as e:
-            print(f"Ошибка при получении списка ID аудитории: {e}")
-            return []
-
-    def get_unused_audience_ids(self, table_name):
-        self.cursor.execute(f"SELECT audience_id FROM parsed_audience WHERE used = 0")
-        return [row[0] for row in self.cursor.fetchall()]
-
-    def mark_audience_id_as_used(self, table_name, audience_id):
-        self.cursor.execute(f"UPDATE parsed_audience SET used = 1 WHERE audience_id = ?", (audience_id,))
-        self.connection.commit()
-    def create_parsed_audience_table(self) -> None:
-        try:
-            c = self.conn.cursor()
-            c.execute("""
-                CREATE TABLE IF NOT EXISTS parsed_audience (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    audience_name TEXT NOT NULL,
-                    total_audience_count INTEGER NOT NULL,
-                    processed_audience_count INTEGER NOT NULL,
-                    audience_date TEXT NOT NULL
-                )
-            """)
-            self.conn.commit()
-            print("Таблица 'parsed_audience' создана.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при создании таблицы: {e}")
-
-
-class AudienceParser:
-    def __init__(self, db_file: str):
-        self.db_file = db_file
-
-    def save_parsed_audience(self, conn, audience_name: str, total_audience_count: int, processed_audience_count: int, audience_date: str) -> None:
-        try:
-            c = conn.cursor()
-            table_name = f"audience_{audience_name}"
-            c.execute(f"""
-                INSERT INTO {table_name} (audience_name, total_audience_count, processed_audience_count, audience_date)
-                VALUES (?, ?, ?, ?)
-            """, (audience_name, total_audience_count, processed_audience_count, audience_date))
-            conn.commit()
-            print(f"Audience data '{audience_name}' saved.")
-        except sqlite3.Error as e:
-            print(f"Error saving audience data: {e}")
-
 class ParsedAudienceTable(QTableWidget):
     def __init__(self, db_manager: DatabaseManager):
         super().__init__()
@@ -276,7 +46,6 @@ class ParsedAudienceTable(QTableWidget):
                 self.insertRow(i)
                 for j, value in enumerate(row):
                     self.setItem(i, j, QTableWidgetItem(str(value)))
-            conn.close()
 
 
 class AudienceTable(QTableWidget):
@@ -303,156 +72,200 @@ class AudienceTable(QTableWidget):
                 self.setItem(i, j, QTableWidgetItem(str(value)))
 
 
+ACCOUNT_HEADERS = ["Имя пользователя", "Пароль", "UA", "Cookie", "Device", "Статус", "Сообщ. всего", "Сообщ. день", "Сообщ. запуск", " "]
 
 
+class AccountTableModel(QAbstractTableModel):
+    """
+    Модель таблицы аккаунтов с постраничной подгрузкой из SQLite.
 
+    Строки подгружаются страницами через canFetchMore/fetchMore. В памяти
+    хранятся только id загруженных строк и ограниченное число страниц
+    с данными; вытесненные страницы перечитываются по диапазону id.
+    """
 
-
-
-
-class AccountManager:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, table_name: str, page_size: int = 500, max_cached_pages: int = 20):
+        super().__init__()
         self.db_manager = db_manager
-
-    def create_task_with_custom_name(self):
-        audience_name, ok = QInputDialog.getText(None, "Создание группы", "Введите имя группы:")
-        if ok:
-            if audience_name:
-                if not audience_name.isalnum():
-                    QMessageBox.warning(None, "Ошибка", "Имя группы должно состоять из букв и цифр.")
-                    return
-                self.db_manager.create_audience_table(audience_name)
-                # Immediately update the table to reflect the new group
-                parsed_audience_table = ParsedAudienceTable(self.db_manager)
-                parsed_audience_table.update_table()
-            else:
-                QMessageBox.warning(None, "Ошибка", "Введите имя группы.")
-
-   
-
-    def add_account(self, table_name: str, account: dict) -> None:
-        """
-        Добавляет аккаунт в таблицу.
-
-        Args:
-            table_name (str): Имя таблицы.
-            account (dict): Словарь с данными аккаунта.
-        """
-        self.db_manager.add_account(table_name, account)
-
-    def get_accounts(self, table_name: str) -> list:
-        """
-        Получает список всех аккаунтов из таблицы.
+        self.table_name = table_name
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+        self._ids = array('q')
+        self._pages = OrderedDict()
+        self._total = 0
+        self._colors = {}
+
+    def reload(self):
+        self.beginResetModel()
+        self._ids = array('q')
+        self._pages.clear()
+        self._total = self.db_manager.count_accounts(self.table_name)
+        self.endResetModel()
+
+    @property
+    def total_count(self) -> int:
+        return self._total
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(ACCOUNT_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return ACCOUNT_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self._ids) < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        after_id = self._ids[-1] if self._ids else 0
+        rows = self.db_manager.get_account_rows(self.table_name, after_id, self.page_size)
+        if not rows:
+            self._total = len(self._ids)
+            return
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._ids.extend(row[0] for row in rows)
+        if first % self.page_size == 0:
+            self._store_page(first // self.page_size, rows)
+        self.endInsertRows()
+
+    def _store_page(self, page: int, rows: list):
+        self._pages[page] = {row[0]: row for row in rows}
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.max_cached_pages:
+            self._pages.popitem(last=False)
+
+    def _row(self, row: int):
+        page = row // self.page_size
+        rows = self._pages.get(page)
+        if rows is None:
+            first = page * self.page_size
+            last = min(first + self.page_size, len(self._ids)) - 1
+            self._store_page(page, self.db_manager.get_account_rows_between(self.table_name, self._ids[first], self._ids[last]))
+            rows = self._pages[page]
+        else:
+            self._pages.move_to_end(page)
+        return rows.get(self._ids[row])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role not in (Qt.DisplayRole, Qt.BackgroundRole):
+            return None
+        row = self._row(index.row())
+        if row is None:
+            return None
+        if role == Qt.BackgroundRole:
+            color = row[len(ACCOUNT_COLUMNS)]
+            if not color:
+                return None
+            if color not in self._colors:
+                self._colors[color] = QColor(color)
+            return self._colors[color]
+        if index.column() == len(ACCOUNT_COLUMNS) - 1:
+            return ""
+        value = row[index.column() + 1]
+        return "" if value is None else str(value)
+
+    def account_id(self, row: int) -> int:
+        return self._ids[row]
+
+    def row_for_account(self, account_id: int) -> int:
+        """
+        Возвращает номер загруженной строки аккаунта или -1 (id отсортированы по возрастанию).
+        """
+        row = bisect_left(self._ids, account_id)
+        if row < len(self._ids) and self._ids[row] == account_id:
+            return row
+        return -1
+
+    def apply_updates(self, updates: dict):
+        """
+        Применяет изменения аккаунтов к загруженным строкам без перечитывания таблицы.
 
         Args:
-            table_name (str): Имя таблицы.
-
-        Returns:
-            list: Список словарей с данными аккаунтов.
-        """
-        return self.db_manager.get_accounts(table_name)
+            updates (dict): account_id -> словарь измененных полей.
+        """
+        changed_rows = []
+        for account_id, changes in updates.items():
+            row = self.row_for_account(account_id)
+            if row < 0:
+                continue
+            rows = self._pages.get(row // self.page_size)
+            if rows is not None and account_id in rows:
+                values = list(rows[account_id])
+                for column, value in changes.items():
+                    if column in ACCOUNT_COLUMNS:
+                        values[ACCOUNT_COLUMNS.index(column) + 1] = value
+                rows[account_id] = tuple(values)
+            changed_rows.append(row)
+        if changed_rows:
+            last_column = self.columnCount() - 1
+            self.dataChanged.emit(self.index(min(changed_rows), 0), self.index(max(changed_rows), last_column), [Qt.DisplayRole, Qt.BackgroundRole])
+
+    def account_at(self, row: int) -> dict:
+        values = self._row(row)
+        if values is None:
+            return None
+        return dict(zip(['id'] + ACCOUNT_COLUMNS, values))
+
+
+class AccountTable(QTableView):
+    # Частота применения накопленных изменений строк (кадров в секунду)
+    UPDATE_FPS = 30
 
-    def update_account_status(self, table_name: str, account: dict):
-        """
-        Обновляет статус аккаунта в базе данных.
+    def __init__(self, db_manager: DatabaseManager, table_name: str):
+        super().__init__()
+        self.db_manager = db_manager
+        self.table_name = table_name
+        self.account_model = AccountTableModel(db_manager, table_name)
+        self._pending_updates = {}
+        self._pending_lock = threading.Lock()
+        self._update_timer = QTimer(self)
+        self._update_timer.timeout.connect(self.flush_account_updates)
+        self._update_timer.start(1000 // self.UPDATE_FPS)
+        self.setModel(self.account_model)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.update_table(table_name)
+        self.clicked.connect(self.handle_item_clicked)
 
-        Args:
-            table_name (str): Имя таблицы.
-            account (dict): Словарь с данными аккаунта.
-        """
-        self.db_manager.update_account_status(table_name, account)
+    def update_table(self, table_name: str = None):
+        with self._pending_lock:
+            self._pending_updates.clear()
+        self.account_model.reload()
 
-    def update_account_messages(self, table_name: str, account_id: int, messages_run: int):
+    def queue_account_update(self, account_id: int, changes: dict):
         """
-        Обновляет счетчик сообщений в базе данных.
+        Ставит изменение аккаунта в очередь на отрисовку (можно вызывать из потока задачи).
 
-        Args:
-            table_name (str): Имя таблицы.
-            account_id (int): ID аккаунта.
-            messages_run (int): Количество сообщений для добавления.
+        Изменения одного аккаунта объединяются и применяются таймером
+        с частотой UPDATE_FPS.
         """
-        try:
-            c = self.db_manager.conn.cursor()
-            c.execute(f"""
-                UPDATE '{table_name}'
-                SET messages_run = messages_run + ?,
-                    messages_total = messages_total + ?
-                WHERE id = ?
-            """, (messages_run, messages_run, account_id))
-            self.db_manager.conn.commit()
-            print(f"Счетчик сообщений для аккаунта '{account_id}' обновлен.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при обновлении счетчика сообщений: {e}")
-
-class TaskManager:
-    def __init__(self, db_file, account_manager, settings):
-        self.db_file = db_file
-        self.account_manager = account_manager
-        self.settings = settings
-
-    def run_task(self, accounts: list, task_type: str, table_name: str):
-        db_manager = DatabaseManager(self.db_file)
-        account_manager = AccountManager(db_manager)
-
-        if task_type == "Проверка валидности":
-            for account in accounts:
-                account_manager.update_account_status(table_name, account)
-        elif task_type == "Парсинг аудитории":
-            self.parse_audience(db_manager, table_name, accounts)
-        elif task_type == "Рассылка сообщений":
-            self.send_messages(db_manager, account_manager, table_name, accounts)
-
-    def parse_audience(self, db_manager: DatabaseManager, table_name: str, accounts: list):
-        for _ in range(len(accounts)):
-            audience_id = random.randint(10000, 100000)
-            db_manager.add_audience_id(table_name, audience_id)
-            time.sleep(0.01)
-
-    def send_messages(self, db_manager: DatabaseManager, account_manager: AccountManager, table_name: str, accounts: list):
-        for account in accounts:
-            unused_audience_ids = db_manager.get_unused_audience_ids(table_name)
-            if unused_audience_ids:
-                audience_id = random.choice(unused_audience_ids)
-                db_manager.mark_audience_id_as_used(table_name, audience_id)
-                account_manager.update_account_messages(table_name, account['id'], 1)
-                time.sleep(0.01)
+        with self._pending_lock:
+            self._pending_updates.setdefault(account_id, {}).update(changes)
 
+    def flush_account_updates(self):
+        with self._pending_lock:
+            if not self._pending_updates:
+                return
+            updates = self._pending_updates
+            self._pending_updates = {}
+        self.account_model.apply_updates(updates)
 
+    def rowCount(self) -> int:
+        return self.account_model.total_count
 
-class AccountTable(QTableWidget, QTableView):
-    def __init__(self, db_manager: DatabaseManager, table_name: str):
-        super().__init__()
-        self.db_manager = db_manager
-        self.table_name = table_name
-        self.setColumnCount(10)
-        self.setHorizontalHeaderLabels(["Имя пользователя", "Пароль", "UA", "Cookie", "Device", "Статус", "Сообщ. всего", "Сообщ. день", "Сообщ. запуск", " "])
-        self.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.update_table(table_name)
-        self.itemClicked.connect(self.handle_item_clicked)
+    def currentRow(self) -> int:
+        return self.currentIndex().row()
 
-    def update_table(self, table_name: str):
-        self.setRowCount(0)
-        accounts = self.db_manager.get_accounts(table_name)
-        for i, account in enumerate(accounts):
-            self.insertRow(i)
-            self.setItem(i, 0, QTableWidgetItem(account['username']))
-            self.setItem(i, 1, QTableWidgetItem(account['password']))
-            self.setItem(i, 2, QTableWidgetItem(account['ua']))
-            self.setItem(i, 3, QTableWidgetItem(account['cookie']))
-            self.setItem(i, 4, QTableWidgetItem(account['device']))
-            self.setItem(i, 5, QTableWidgetItem(account['status_account']))
-            self.setItem(i, 6, QTableWidgetItem(str(account['messages_total'])))
-            self.setItem(i, 7, QTableWidgetItem(str(account['messages_day'])))
-            self.setItem(i, 8, QTableWidgetItem(str(account['messages_run'])))
-            self.setItem(i, 9, QTableWidgetItem(""))
-
-            # Установка цвета строки
-            color = account['color']
-            if color:
-                for j in range(10):
-                    self.item(i, j).setBackground(QColor(color))
+    def account_at(self, row: int) -> dict:
+        return self.account_model.account_at(row)
 
     def select_rows_with_shift(self, key):
         """
@@ -462,11 +275,11 @@ class AccountTable(QTableWidget, QTableView):
         if key == Qt.Key_Up:
             if current_row > 0:
                 self.selectRow(current_row - 1)
-                self.setCurrentCell(current_row - 1, 0)
+                self.setCurrentIndex(self.account_model.index(current_row - 1, 0))
         elif key == Qt.Key_Down:
-            if current_row < self.rowCount() - 1:
+            if current_row < self.account_model.rowCount() - 1:
                 self.selectRow(current_row + 1)
-                self.setCurrentCell(current_row + 1, 0)
+                self.setCurrentIndex(self.account_model.index(current_row + 1, 0))
 
     def select_rows_with_ctrl(self, key):
         """
@@ -474,19 +287,17 @@ class AccountTable(QTableWidget, QTableView):
         """
         current_row = self.currentRow()
         if key == Qt.Key_Up:
-            if current_row > 0:
-                if self.isRowSelected(current_row - 1):
-                    self.removeRowSelection(current_row - 1)
-                else:
-                    self.selectRow(current_row - 1)
+            target = current_row - 1
         elif key == Qt.Key_Down:
-            if current_row < self.rowCount() - 1:
-                if self.isRowSelected(current_row + 1):
-                    self.removeRowSelection(current_row + 1)
-                else:
-                    self.selectRow(current_row + 1)
-
-
+            target = current_row + 1
+        else:
+            return
+        if 0 <= target < self.account_model.rowCount():
+            selection = self.selectionModel()
+            if selection.isRowSelected(target, QModelIndex()):
+                selection.select(self.account_model.index(target, 0), QItemSelectionModel.Deselect | QItemSelectionModel.Rows)
+            else:
+                self.selectRow(target)
 
     def contextMenuEvent(self, event):
         """
@@ -508,30 +319,139 @@ class AccountTable(QTableWidget, QTableView):
         # Подтверждение удаления
         reply = QMessageBox.question(self, "Удаление строк", f"Вы уверены, что хотите удалить {len(selected_rows)} строк?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            # Удаление из базы данных
-            for row_id in selected_row_ids:
-                try:
-                    # Получаем id из базы данных для соответствующей строки
-                    c = self.db_manager.conn.cursor()
-                    c.execute(f"SELECT id FROM '{self.table_name}' LIMIT 1 OFFSET ?", (row_id,))
-                    db_row_id = c.fetchone()
-                    if db_row_id:
-                        c.execute(f"DELETE FROM '{self.table_name}' WHERE id = ?", (db_row_id[0],))
-                        self.db_manager.conn.commit()
-                        print(f"Строка с id {db_row_id[0]} удалена из таблицы '{self.table_name}'.")
-                except sqlite3.Error as e:
-                    print(f"Ошибка при удалении строки: {e}")
-
-            # Удаление из таблицы
-            for row_id in sorted(selected_row_ids, reverse=True):
-                self.removeRow(row_id)
-
-    def handle_item_clicked(self, item: QTableWidgetItem):
-        row = self.row(item)
+            account_ids = [self.account_model.account_id(row_id) for row_id in selected_row_ids]
+            self.db_manager.delete_accounts(self.table_name, account_ids)
+            self.update_table()
+
+    def handle_item_clicked(self, index: QModelIndex):
+        row = index.row()
         print(row)
 
         self.selectRow(row)
 
+class AccountTablePlaceholder(QLabel):
+    """
+    Заглушка вкладки: таблица аккаунтов создается при первом открытии вкладки.
+    """
+    def __init__(self, table_name: str, row_count: int):
+        super().__init__(f"Аккаунтов: {row_count}. Таблица загрузится при открытии вкладки.")
+        self.table_name = table_name
+        self.setAlignment(Qt.AlignCenter)
+
+class TaskWorker(QObject):
+    """
+    Выполняет задачу в отдельном QThread и сообщает о ходе работы сигналами.
+
+    Прогресс, статус и спарсенная аудитория отправляются не чаще max_rate
+    раз в секунду, чтобы не перегружать цикл событий на больших задачах.
+    """
+
+    DEFAULT_MAX_RATE = 20.0
+
+    progress = pyqtSignal(int, int)
+    status = pyqtSignal(str)
+    audience_parsed = pyqtSignal(list)
+    finished = pyqtSignal(bool)
+
+    def __init__(self, task_manager, table_name: str, task_type: str, audience_name: str, on_account_update=None, max_rate: float = DEFAULT_MAX_RATE):
+        super().__init__()
+        self.task_manager = task_manager
+        self.table_name = table_name
+        self.task_type = task_type
+        self.audience_name = audience_name
+        self.on_account_update = on_account_update
+        self.throttle = RateThrottle(max_rate)
+        self._stop_event = threading.Event()
+        self._stopped_by_user = False
+        self._done = 0
+        self._total = 0
+        self._base_done = 0
+        self.counters = None
+
+    def stop(self):
+        self._stopped_by_user = True
+        self._stop_event.set()
+
+    def run(self):
+        account_manager = self.task_manager.account_manager
+        self.status.emit("Статус: Выполняется")
+        self._parsed = []
+        self._lock = threading.Lock()
+        try:
+            job_queue = self.task_manager.job_queue
+            # Новая задача создается уже захваченной этим окном, чтобы ее не взял демон
+            owner = new_owner()
+            unfinished = job_queue.find_unfinished(self.task_type, self.table_name, self.audience_name,
+                                                   ttl=self.task_manager.task_ttl)
+            if unfinished:
+                task_id = unfinished[-1]
+                self.status.emit(f"Статус: Продолжение задачи #{task_id}")
+            else:
+                task_id = job_queue.create_task(self.task_type, self.table_name, self.audience_name,
+                                                account_manager.db_manager.get_account_ids(self.table_name), owner=owner)
+            counts = job_queue.counts(task_id)
+            self._total = sum(counts.values())
+            self._done = counts.get('done', 0) + counts.get('failed', 0)
+            self.progress.emit(self._done, self._total)
+            self._base_done = self._done
+            if self.task_manager.settings.get('execution_mode') == 'processes':
+                self.counters = SharedCounters(self.task_manager.process_count(self._total or 1))
+            self.task_manager.run_queued_task(task_id, self.on_account_update, self.handle_result, self._stop_event, self.counters,
+                                              owner)
+            counts = job_queue.counts(task_id)
+            self.progress.emit(counts.get('done', 0) + counts.get('failed', 0), self._total)
+            if self._parsed:
+                self.audience_parsed.emit(self._parsed)
+        except Exception as e:
+            print(f"Ошибка при выполнении задачи: {e}")
+            self.status.emit(f"Ошибка: {e}")
+        finally:
+            account_manager.db_manager.release()
+            counters, self.counters = self.counters, None
+            if counters is not None:
+                counters.unlink()
+
+        stopped = self._stopped_by_user
+        if stopped:
+            self.status.emit("Статус: Остановлено")
+        elif self.task_type == "Парсинг аудитории":
+            self.status.emit("Статус: Парсинг завершен")
+        else:
+            self.status.emit("Статус: Завершено")
+        self.finished.emit(stopped)
+
+    def shared_progress(self):
+        """
+        Возвращает (выполнено, всего) по разделяемым счетчикам или None вне режима processes.
+        """
+        counters = self.counters
+        totals = counters.totals() if counters is not None else None
+        if totals is None:
+            return None
+        return self._base_done + totals['processed'], self._total
+
+    def handle_result(self, account: dict, value):
+        """
+        Вызывается рабочими потоками после каждого аккаунта; сигналы отправляются с ограничением частоты.
+        """
+        with self._lock:
+            self._done += 1
+            if self.task_type == "Парсинг аудитории" and value:
+                self._parsed.extend(value)
+            elif self.task_type == "Парсинг и рассылка" and value:
+                self._parsed.extend(value['found'])
+            # В режиме processes прогресс окно берет из разделяемых счетчиков
+            if self.counters is not None and not self._parsed:
+                return
+            if not self.throttle.ready():
+                return
+            done = self._done
+            parsed, self._parsed = self._parsed, []
+        self.progress.emit(done, self._total)
+        if parsed:
+            self.audience_parsed.emit(parsed)
+
+
 class TaskWindow(QWidget):
     def __init__(self, main_window, table_name: str, task_type: str, audience_name: str):
         super().__init__()
@@ -548,7 +468,7 @@ class TaskWindow(QWidget):
         self.stop_button.clicked.connect(self.stop_task)
         self.progress_bar = QProgressBar()
 
-        if task_type == "Парсинг аудитории":
+        if task_type in ("Парсинг аудитории", "Парсинг и рассылка"):
             self.save_audience_button = QPushButton("Сохранить аудиторию")
             self.save_audience_button.clicked.connect(self.save_audience)
             self.audience_label = QLabel("Аудитория:")
@@ -561,61 +481,62 @@ class TaskWindow(QWidget):
         layout.addWidget(self.stop_button)
         layout.addWidget(self.progress_bar)
 
-        if task_type == "Парсинг аудитории":
+        if task_type in ("Парсинг аудитории", "Парсинг и рассылка"):
             layout.addWidget(self.audience_label)
             layout.addWidget(self.audience_list)
             layout.addWidget(self.save_audience_button)
 
         self.setLayout(layout)
 
-        # Start the task in a separate thread
-        self.thread = threading.Thread(target=self.run_task)
-        self.thread.start()
-
-    def run_task(self):
-        self.status_label.setText("Статус: Выполняется")
-        conn = self.main_window.db_manager.connect()
-        if not conn:
-            self.status_label.setText("Ошибка: Не удалось подключиться к базе данных")
-            return
-
-        self.main_window.db_manager.create_audience_table(conn, self.audience_name)
+        # Подготовка аудитории выполняется в GUI-потоке до запуска задачи
+        self.main_window.db_manager.create_audience_table(self.main_window.db_manager.conn, self.audience_name)
         self.main_window.audience_table.update_table()
 
-        accounts = self.main_window.account_manager.get_accounts(self.table_name)
-        audience = []
-        self.progress_bar.setMaximum(len(accounts))
-        for i, account in enumerate(accounts):
-            if self.stop_flag:
-                break
-
-            if self.task_type == "Проверка валидности":
-                self.main_window.account_manager.update_account_status(self.table_name, account)
-                self.main_window.tab_widget.currentWidget().update_table(self.table_name)
-                self.progress_bar.setValue(i + 1)
-            elif self.task_type == "Парсинг аудитории":
-                self.main_window.task_manager.parse_audience(self.table_name, [account])
-                self.audience_list.setText("\n".join(str(id) for id in self.main_window.db_manager.get_audience_ids(self.table_name)))
-                self.progress_bar.setValue(i + 1)
-            elif self.task_type == "Рассылка сообщений":
-                self.main_window.task_manager.send_messages(self.table_name, [account])
-                self.main_window.tab_widget.currentWidget().update_table(self.table_name)
-                self.progress_bar.setValue(i + 1)
-
-        conn.close()
-
-        if self.stop_flag:
-            self.status_label.setText("Статус: Остановлено")
-        else:
-            if self.task_type == "Проверка валидности":
-                self.status_label.setText("Статус: Завершено")
-            elif self.task_type == "Парсинг аудитории":
-                self.status_label.setText("Статус: Парсинг завершен")
-            elif self.task_type == "Рассылка сообщений":
-                self.status_label.setText("Статус: Завершено")
+        # Запуск задачи в отдельном QThread; с интерфейсом поток общается только сигналами
+        account_table = self.main_window.find_account_table(table_name)
+        max_rate = float(self.main_window.settings.get('progress_rate') or TaskWorker.DEFAULT_MAX_RATE)
+        self.worker_thread = QThread()
+        self.worker = TaskWorker(self.main_window.task_manager, table_name, task_type, audience_name,
+                                 account_table.queue_account_update if account_table else None, max_rate)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.status.connect(self.status_label.setText)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.audience_parsed.connect(self.append_audience)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker_thread.start()
+
+        # В режиме processes прогресс опрашивается из разделяемой памяти
+        self.counters_timer = QTimer(self)
+        self.counters_timer.timeout.connect(self.sample_counters)
+        self.worker.finished.connect(self.counters_timer.stop)
+        if self.main_window.settings.get('execution_mode') == 'processes':
+            self.counters_timer.start(int(1000 / max_rate))
+
+    def update_progress(self, done: int, total: int):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
+    def sample_counters(self):
+        """
+        Обновляет progress_bar по разделяемым счетчикам рабочих процессов.
+        """
+        progress = self.worker.shared_progress()
+        if progress is not None:
+            self.update_progress(*progress)
+
+    def append_audience(self, audience_ids: list):
+        self.audience_list.append("\n".join(str(audience_id) for audience_id in audience_ids))
 
     def stop_task(self):
         self.stop_flag = True
+        self.worker.stop()
+
+    def closeEvent(self, event):
+        self.stop_task()
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+        super().closeEvent(event)
 
     def save_audience(self):
         """
@@ -627,7 +548,7 @@ class TaskWindow(QWidget):
                 if not filename.endswith(".txt"):
                     QMessageBox.warning(self, "Ошибка", "Имя файла должно заканчиваться на '.txt'.")
                     return
-                audience_ids = self.main_window.db_manager.get_audience_ids(self.table_name)
+                audience_ids = self.main_window.db_manager.get_audience_ids(self.audience_name)
                 self.save_audience_to_file(audience_ids, filename)
             else:
                 QMessageBox.warning(self, "Ошибка", "Введите имя файла.")
@@ -668,7 +589,7 @@ class SettingsWindow(QWidget):
 
         # Создание компоновки
         layout = QVBoxLayout()
-        layout.addWidget(QLabel("Прокси:"))
+        layout.addWidget(QLabel("Прокси (через запятую):"))
         layout.addWidget(self.proxy_input)
         layout.addWidget(QLabel("Спинтаксы:"))
         layout.addWidget(self.spintax_input)
@@ -700,26 +621,37 @@ class SettingsWindow(QWidget):
         QMessageBox.information(self, "Сохранение настроек", "Настройки сохранены.")
 
 class MainWindow(QMainWindow):
+    # Группа перенесена в общую таблицу accounts (испускается из потока переноса)
+    account_table_migrated = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Управление аккаунтами")
         self.db_manager = DatabaseManager('accounts.db')
+        self.db_manager.migrate()
         self.account_manager = AccountManager(self.db_manager)
         self.settings = defaultdict(lambda: None)
         self.current_table = None
         self.available_tables = []
+        self.task_windows = []
 
         self.task_manager = TaskManager('accounts.db', self.account_manager, self.settings)
 
         # Initialize UI components
         self.initUI()
 
+        # Перенос таблиц старого формата идет в фоне, приложение остается доступным
+        self.account_table_migrated.connect(self.reload_account_table)
+        self.migration_stop = threading.Event()
+        self.migration_thread = threading.Thread(target=self.migrate_account_tables, daemon=True)
+        self.migration_thread.start()
+
     def initUI(self):
         self.create_table_button = QPushButton("Создать таблицу")
         self.load_accounts_button = QPushButton("Загрузить аккаунты")
         self.start_task_button = QPushButton("Запустить задачу")
         self.task_select = QComboBox()
-        self.task_select.addItems(["Проверка валидности", "Парсинг аудитории", "Рассылка сообщений"])
+        self.task_select.addItems(["Проверка валидности", "Парсинг аудитории", "Рассылка сообщений", "Парсинг и рассылка"])
         self.fill_table_button = QPushButton("Заполнить таблицу")
         self.fill_table_button.clicked.connect(self.fill_table_with_data)
 
@@ -730,6 +662,7 @@ class MainWindow(QMainWindow):
         self.tab_widget = QTabWidget()
         self.tab_widget.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tab_widget.customContextMenuRequested.connect(self.show_table_context_menu)
+        self.tab_widget.currentChanged.connect(self.activate_tab)
 
         # Placeholder for audience table
         self.audience_table = ParsedAudienceTable(self.db_manager)
@@ -767,6 +700,7 @@ class MainWindow(QMainWindow):
                 return
             task_type = self.task_select.currentText()
             task_window = TaskWindow(self, self.current_table, task_type, audience_name)
+            self.task_windows.append(task_window)
             task_window.show()
         else:
             QMessageBox.warning(self, "Ошибка", "Введите название группы.")
@@ -782,7 +716,37 @@ class MainWindow(QMainWindow):
         """
         Обработка задачи (в отдельном потоке).
         """
-        self.task_manager.run_task(accounts, task_type, table_name)
+        account_table = self.find_account_table(table_name)
+        on_account_update = account_table.queue_account_update if account_table else None
+        self.task_manager.run_task(accounts, task_type, table_name, on_account_update=on_account_update)
+
+    def migrate_account_tables(self):
+        """
+        Переносит таблицы аккаунтов старого формата в общую таблицу (в отдельном потоке).
+        """
+        try:
+            self.db_manager.migrate_account_tables(stop_event=self.migration_stop, retry_interval=30,
+                                                   on_group_migrated=self.account_table_migrated.emit)
+        finally:
+            self.db_manager.release()
+
+    def reload_account_table(self, table_name: str):
+        """
+        Перечитывает открытую вкладку группы после ее переноса (id аккаунтов изменились).
+        """
+        account_table = self.find_account_table(table_name)
+        if account_table is not None:
+            account_table.update_table(table_name)
+
+    def find_account_table(self, table_name: str):
+        """
+        Возвращает вкладку с таблицей аккаунтов по имени таблицы.
+        """
+        for index in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(index)
+            if isinstance(widget, AccountTable) and widget.table_name == table_name:
+                return widget
+        return None
 
     def show_create_table_dialog(self):
         """
@@ -817,10 +781,10 @@ class MainWindow(QMainWindow):
                 try:
                     with open(file_path, 'r', encoding='utf-8') as f:
                         reader = csv.DictReader(f)
-                        for row in reader:
-                            self.account_manager.add_account(self.current_table, row)
-                            # Обновляем таблицу в UI
-                            self.tab_widget.currentWidget().update_table(self.current_table)
+                        imported = self.account_manager.import_accounts(self.current_table, reader, self.show_import_progress)
+                    # Обновляем таблицу в UI один раз после импорта
+                    self.tab_widget.currentWidget().update_table(self.current_table)
+                    self.statusBar().showMessage(f"Загружено аккаунтов: {imported}")
                 except Exception as e:
                     print(f"Ошибка при загрузке аккаунтов: {e}")
                     QMessageBox.warning(self, "Ошибка", f"Ошибка при загрузке аккаунтов: {e}")
@@ -829,6 +793,13 @@ class MainWindow(QMainWindow):
         else:
             print("Загрузка аккаунтов отменена.")
 
+    def show_import_progress(self, imported: int):
+        """
+        Отображает прогресс импорта аккаунтов.
+        """
+        self.statusBar().showMessage(f"Загрузка аккаунтов: {imported}")
+        QApplication.processEvents()
+
     def send_selected_to_task(self):
         """
         Отправляет выделенные аккаунты в задачу.
@@ -843,8 +814,7 @@ class MainWindow(QMainWindow):
                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
             # Получаем данные аккаунтов из базы данных
-            accounts = self.account_manager.get_accounts(self.tab_widget.currentWidget().table_name)
-            selected_accounts = [accounts[row_id] for row_id in selected_row_ids]
+            selected_accounts = [self.tab_widget.currentWidget().account_at(row_id) for row_id in selected_row_ids]
             self.send_selected_to_task_thread(selected_accounts, selected_task, self.tab_widget.currentWidget().table_name)
 
 
@@ -871,14 +841,13 @@ class MainWindow(QMainWindow):
                 return
 
         row_count = random.randint(50, 500)
-        for _ in range(row_count):
-            self.account_manager.add_account(self.current_table, {
-                'username': f'user_{random.randint(1, 1000)}',
-                'password': f'pass_{random.randint(1, 1000)}',
-                'ua': f'UA_{random.randint(1, 1000)}',
-                'cookie': f'cookie_{random.randint(1, 1000)}',
-                'device': f'device_{random.randint(1, 1000)}'
-            })
+        self.account_manager.import_accounts(self.current_table, ({
+            'username': f'user_{random.randint(1, 1000)}',
+            'password': f'pass_{random.randint(1, 1000)}',
+            'ua': f'UA_{random.randint(1, 1000)}',
+            'cookie': f'cookie_{random.randint(1, 1000)}',
+            'device': f'device_{random.randint(1, 1000)}'
+        } for _ in range(row_count)))
         # Обновляем только текущую таблицу
         self.tab_widget.currentWidget().update_table(self.current_table)
         # Перерисовываем QTabWidget, чтобы изменения стали видны
@@ -886,25 +855,39 @@ class MainWindow(QMainWindow):
 
     def load_tables_from_database(self):
         """
-        Загружает таблицы из базы данных.
+        Добавляет вкладки для таблиц аккаунтов из базы данных.
+
+        Вкладки создаются заглушками с количеством строк из account_groups;
+        данные читаются только при первом открытии вкладки (activate_tab).
         """
         print("Загрузка таблиц из базы данных")  # Логирование
         try:
-            c = self.db_manager.conn.cursor()
-            c.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in c.fetchall() if row[0] != 'sqlite_sequence']
-
-            # Добавляем вкладки для каждой таблицы
-            for table_name in tables:
+            for table_name, row_count in self.db_manager.get_account_groups():
                 if table_name not in self.available_tables:
                     self.available_tables.append(table_name)
-                    self.account_table = AccountTable(self.db_manager, table_name)
-                    self.tab_widget.addTab(self.account_table, table_name)
-                    # Заполняем таблицу данными из БД
-                    self.account_table.update_table(table_name)
+                    index = self.tab_widget.addTab(AccountTablePlaceholder(table_name, row_count), table_name)
+                    self.tab_widget.setTabToolTip(index, f"Аккаунтов: {row_count}")
         except Exception as e:
             print(f"Ошибка при загрузке таблиц из базы данных: {e}")
 
+    def activate_tab(self, index: int):
+        """
+        Заменяет заглушку открытой вкладки таблицей аккаунтов.
+        """
+        widget = self.tab_widget.widget(index)
+        if widget is None:
+            return
+        if isinstance(widget, AccountTablePlaceholder):
+            account_table = AccountTable(self.db_manager, widget.table_name)
+            self.tab_widget.blockSignals(True)
+            self.tab_widget.removeTab(index)
+            self.tab_widget.insertTab(index, account_table, widget.table_name)
+            self.tab_widget.setCurrentIndex(index)
+            self.tab_widget.blockSignals(False)
+            widget.deleteLater()
+            widget = account_table
+        self.current_table = widget.table_name
+
     def show_table_context_menu(self, point):
         """
         Отображает контекстное меню для таблицы.
@@ -923,7 +906,7 @@ class MainWindow(QMainWindow):
         Удаляет таблицу из базы данных и интерфейса.
         """
         current_index = self.tab_widget.currentIndex()
-        table_name = self.tab_widget.tabText(current_index)
+        table_name = self.tab_widget.widget(current_index).table_name
 
         # Подтверждение удаления
         reply = QMessageBox.question(self, "Удаление таблицы", f"Вы уверены, что хотите удалить таблицу '{table_name}'?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
@@ -936,15 +919,40 @@ class MainWindow(QMainWindow):
         else:
             print(f"Удаление таблицы '{table_name}' отменено.")
 
+    def closeEvent(self, event):
+        """
+        Закрывает соединения с базой данных при закрытии окна.
+        """
+        self.migration_stop.set()
+        self.migration_thread.join()
+        self.task_manager.close()
+        self.db_manager.close()
+        super().closeEvent(event)
+
+    def create_task_with_custom_name(self):
+        audience_name, ok = QInputDialog.getText(None, "Создание группы", "Введите имя группы:")
+        if ok:
+            if audience_name:
+                if not audience_name.isalnum():
+                    QMessageBox.warning(None, "Ошибка", "Имя группы должно состоять из букв и цифр.")
+                    return
+                self.db_manager.create_audience_table(audience_name)
+                # Immediately update the table to reflect the new group
+                parsed_audience_table = ParsedAudienceTable(self.db_manager)
+                parsed_audience_table.update_table()
+            else:
+                QMessageBox.warning(None, "Ошибка", "Введите имя группы.")
+
     def load_settings(self):
         """
         Загружает настройки из файла (реализуйте свою логику загрузки).
         """
         try:
-            with open('settings.txt', 'r') as f:
-                for line in f:
-                    key, value = line.strip().split("=", 1)
-                    self.settings[key] = value
+            read_settings('settings.txt', self.settings)
+            if self.settings.get('db_busy_timeout'):
+                # Применяется к соединениям, открываемым потоками задач
+                self.db_manager.pool.busy_timeout = float(self.settings['db_busy_timeout'])
+            self.task_manager.reload_settings()
             print("Настройки загружены.")
         except FileNotFoundError:
             print("Файл настроек не найден. Используются стандартные настройки.")
@@ -954,7 +962,7 @@ class MainWindow(QMainWindow):
         Сохраняет настройки в файл (реализуйте свою логику сохранения).
         """
         try:
-            with open('settings.txt', 'w') as f:
+            with open('settings.txt', 'w', encoding='utf-8') as f:
                 for key, value in self.settings.items():
                     f.write(f"{key}={value}\n")
             print("Настройки сохранены.")
@@ -962,43 +970,6 @@ class MainWindow(QMainWindow):
             print(f"Ошибка при сохранении настроек: {e}")
 
 
-
-def ensure_parsed_audience_table_exists(db_file: str):
-    try:
-        conn = sqlite3.connect(db_file)
-        c = conn.cursor()
-        
-        # Check if table exists
-        c.execute("""
-            SELECT name 
-            FROM sqlite_master 
-            WHERE type='table' AND name='parsed_audience';
-        """)
-        
-        if c.fetchone() is None:
-            # Create table if it does not exist
-            c.execute("""
-                CREATE TABLE parsed_audience (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    audience_name TEXT NOT NULL,
-                    total_audience_count INTEGER NOT NULL,
-                    processed_audience_count INTEGER NOT NULL,
-                    audience_date TEXT NOT NULL
-                )
-            """)
-            conn.commit()
-            print("Table 'parsed_audience' created.")
-        else:
-            print("Table 'parsed_audience' already exists.")
-        
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
-ensure_parsed_audience_table_exists('accounts.db')
-
-
 if __name__ == "__main__":
     app = QApplication([])
     main_window = MainWindow()
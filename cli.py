@@ -0,0 +1,218 @@
+"""
+Запуск задач без графического интерфейса.
+
+Примеры:
+    python cli.py check --table g            # проверка валидности
+    python cli.py parse --table g --audience a1
+    python cli.py send --table g --audience a1
+    python cli.py pipeline --table g --audience a1
+    python cli.py enqueue send --table g     # поставить задачу в очередь для демона
+    python cli.py daemon                     # выполнять задачи из очереди
+    python cli.py status                     # последние задачи и их задания
+    python cli.py groups                     # группы и число аккаунтов по статусам
+
+Задачи выполняются тем же TaskManager, что и в GUI, через очередь заданий
+в базе, поэтому прерванная задача продолжается с места остановки.
+Ctrl+C или SIGTERM останавливают задачу после текущих аккаунтов.
+"""
+import argparse
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from core import AccountManager, AccountWriteError, DatabaseManager, RateThrottle, TaskManager, new_owner, read_settings
+
+
+TASK_TYPES = {
+    'check': "Проверка валидности",
+    'parse': "Парсинг аудитории",
+    'send': "Рассылка сообщений",
+    'pipeline': "Парсинг и рассылка",
+}
+
+
+def load_settings(args) -> dict:
+    try:
+        settings = read_settings(args.settings)
+    except FileNotFoundError:
+        print(f"Файл настроек '{args.settings}' не найден. Используются стандартные настройки.")
+        settings = defaultdict(lambda: None)
+    if args.mode:
+        settings['execution_mode'] = args.mode
+    return settings
+
+
+def install_stop_handlers(stop_event: threading.Event) -> None:
+    """
+    Ctrl+C и SIGTERM ставят событие остановки вместо прерывания потоков.
+    """
+    def handle(signum, frame):
+        if not stop_event.is_set():
+            print("Остановка: дожидаемся завершения текущих аккаунтов...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, handle)
+
+
+def progress_printer(task_manager: TaskManager, task_id: int):
+    """
+    Возвращает on_result, печатающий прогресс задачи не чаще раза в секунду.
+    """
+    counts = task_manager.job_queue.counts(task_id)
+    total = sum(counts.values())
+    done = [counts.get('done', 0) + counts.get('failed', 0)]
+    throttle = RateThrottle(1.0)
+    lock = threading.Lock()
+
+    def on_result(account, value):
+        with lock:
+            done[0] += 1
+            if throttle.ready():
+                print(f"Задача #{task_id}: {done[0]}/{total}")
+
+    return on_result
+
+
+def run_queued(task_manager: TaskManager, task_id: int, stop_event: threading.Event, owner: str = None) -> int:
+    started = time.monotonic()
+    try:
+        result = task_manager.run_queued_task(task_id, on_result=progress_printer(task_manager, task_id), stop_event=stop_event,
+                                              owner=owner)
+    except AccountWriteError as e:
+        # Незаписанные задания остались в очереди и будут выполнены при следующем запуске
+        print(f"Задача #{task_id} прервана: {e}")
+        return task_id
+    counts = task_manager.job_queue.counts(task_id)
+    print(f"Задача #{task_id}: обработано {result.processed}, успешно {result.succeeded}, ошибок {result.failed} "
+          f"за {time.monotonic() - started:.1f} с; задания: {counts}.")
+    return task_id
+
+
+def command_run(args, task_manager: TaskManager, stop_event: threading.Event) -> int:
+    task_type = TASK_TYPES[args.command]
+    job_queue = task_manager.job_queue
+    audience_name = args.audience or args.table
+    owner = new_owner()
+    unfinished = job_queue.find_unfinished(task_type, args.table, audience_name, args.status, task_manager.task_ttl)
+    if unfinished and not args.new:
+        task_id = unfinished[-1]
+        print(f"Продолжение задачи #{task_id}.")
+    else:
+        account_ids = task_manager.account_manager.db_manager.get_account_ids(args.table, args.status)
+        if not account_ids:
+            print(f"В таблице '{args.table}' нет подходящих аккаунтов.")
+            return 1
+        # Задача создается уже захваченной, чтобы ее не взял демон
+        task_id = job_queue.create_task(task_type, args.table, audience_name, account_ids, args.status, owner)
+    run_queued(task_manager, task_id, stop_event, owner)
+    return 0
+
+
+def command_enqueue(args, task_manager: TaskManager, stop_event: threading.Event) -> int:
+    account_ids = task_manager.account_manager.db_manager.get_account_ids(args.table, args.status)
+    if not account_ids:
+        print(f"В таблице '{args.table}' нет подходящих аккаунтов.")
+        return 1
+    task_manager.job_queue.create_task(TASK_TYPES[args.task], args.table, args.audience or args.table, account_ids, args.status)
+    return 0
+
+
+def command_daemon(args, task_manager: TaskManager, stop_event: threading.Event) -> int:
+    """
+    Берет задачи в состоянии 'pending' из очереди и выполняет их по одной.
+    Задачи 'running', владелец которых перестал отмечаться (процесс убит),
+    забираются повторно. Прерванная остановкой или ошибкой записи задача
+    возвращается в 'pending' для следующего запуска.
+    """
+    job_queue = task_manager.job_queue
+    owner = new_owner()
+    print(f"Демон запущен: база '{task_manager.db_file}', опрос очереди раз в {args.poll:g} с.")
+    while not stop_event.is_set():
+        task_id = job_queue.claim_task(owner, task_manager.task_ttl)
+        if task_id is None:
+            stop_event.wait(args.poll)
+            continue
+        task = job_queue.get_task(task_id)
+        print(f"Задача #{task_id} '{task['task_type']}' для таблицы '{task['table_name']}' взята в работу.")
+        run_queued(task_manager, task_id, stop_event, owner)
+        if job_queue.counts(task_id).get('pending'):
+            job_queue.set_task_state(task_id, 'pending')
+            stop_event.wait(args.poll)
+    print("Демон остановлен.")
+    return 0
+
+
+def command_status(args, task_manager: TaskManager, stop_event: threading.Event) -> int:
+    for task in task_manager.job_queue.list_tasks(args.limit):
+        jobs = ', '.join(f"{state}: {count}" for state, count in sorted(task['jobs'].items()))
+        print(f"#{task['id']} [{task['state']}] {task['task_type']} '{task['table_name']}' ({jobs}) {task['updated_at'] or task['created_at']}")
+    return 0
+
+
+def command_groups(args, task_manager: TaskManager, stop_event: threading.Event) -> int:
+    db_manager = task_manager.account_manager.db_manager
+    by_status = db_manager.count_accounts_by_status()
+    for name, row_count in db_manager.get_account_groups():
+        statuses = ', '.join(f"{status}: {count}" for status, count in sorted(by_status.get(name, {}).items(), key=lambda item: str(item[0])))
+        print(f"'{name}': {row_count} ({statuses})")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Запуск задач без графического интерфейса.")
+    parser.add_argument('--db', default='accounts.db', help="файл базы данных (по умолчанию accounts.db)")
+    parser.add_argument('--settings', default='settings.txt', help="файл настроек (по умолчанию settings.txt)")
+    parser.add_argument('--mode', choices=['threads', 'async', 'processes'], help="переопределить execution_mode")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for command, task_type in TASK_TYPES.items():
+        run = commands.add_parser(command, help=task_type)
+        run.add_argument('--table', required=True, help="таблица аккаунтов")
+        run.add_argument('--audience', help="имя аудитории (по умолчанию совпадает с таблицей)")
+        run.add_argument('--new', action='store_true', help="не продолжать незавершенную задачу, а создать новую")
+        run.add_argument('--status', help="взять только аккаунты с этим статусом, например 'Валидный'")
+        run.set_defaults(handler=command_run)
+
+    enqueue = commands.add_parser('enqueue', help="поставить задачу в очередь для демона")
+    enqueue.add_argument('task', choices=list(TASK_TYPES))
+    enqueue.add_argument('--table', required=True, help="таблица аккаунтов")
+    enqueue.add_argument('--audience', help="имя аудитории (по умолчанию совпадает с таблицей)")
+    enqueue.add_argument('--status', help="взять только аккаунты с этим статусом")
+    enqueue.set_defaults(handler=command_enqueue)
+
+    daemon = commands.add_parser('daemon', help="выполнять задачи из очереди")
+    daemon.add_argument('--poll', type=float, default=5.0, help="интервал опроса очереди, с")
+    daemon.set_defaults(handler=command_daemon)
+
+    status = commands.add_parser('status', help="последние задачи")
+    status.add_argument('--limit', type=int, default=20)
+    status.set_defaults(handler=command_status)
+
+    groups = commands.add_parser('groups', help="группы аккаунтов и число аккаунтов по статусам")
+    groups.set_defaults(handler=command_groups)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    settings = load_settings(args)
+    db_manager = DatabaseManager(args.db, float(settings.get('db_busy_timeout') or 5.0))
+    db_manager.migrate()
+    task_manager = TaskManager(args.db, AccountManager(db_manager), settings)
+    stop_event = threading.Event()
+    install_stop_handlers(stop_event)
+    try:
+        # Таблицы старого формата переносятся в общую таблицу accounts до запуска команды
+        db_manager.migrate_account_tables(stop_event=stop_event)
+        return args.handler(args, task_manager, stop_event)
+    finally:
+        task_manager.close()
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
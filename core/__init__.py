@@ -0,0 +1,81 @@
+"""
+Ядро приложения без графического интерфейса: база, аккаунты, спинтакс, задачи.
+
+Пакет не импортирует Qt и ничего не делает при импорте: модули
+загружаются при первом обращении к экспортируемому имени, например
+``from core import DatabaseManager`` загружает только core.db.
+"""
+import importlib
+
+# Экспортируемое имя -> модуль пакета
+_EXPORTS = {
+    'ACCOUNT_COLUMNS': 'db',
+    'ACCOUNT_EXTRA_COLUMNS': 'db',
+    'STATUS_COLORS': 'db',
+    'SCHEMA_MIGRATIONS': 'db',
+    'ACCOUNT_MIGRATION_BATCH': 'db',
+    'ACCOUNT_MIGRATION_PAUSE': 'db',
+    'DEFAULT_AUDIENCE_CLAIM_TTL': 'db',
+    'ConnectionPool': 'db',
+    'DatabaseManager': 'db',
+    'ensure_parsed_audience_table_exists': 'db',
+    'AccountManager': 'accounts',
+    'AudienceParser': 'accounts',
+    'DEFAULT_SEND_RATE_GLOBAL': 'limits',
+    'DEFAULT_SEND_RATE_ACCOUNT': 'limits',
+    'DEFAULT_DAILY_LIMIT': 'limits',
+    'TokenBucket': 'limits',
+    'RateLimiter': 'limits',
+    'RateThrottle': 'limits',
+    'Spintax': 'spintax',
+    'SpintaxExhausted': 'spintax',
+    'DigestSet': 'spintax',
+    'SpintaxAllocator': 'spintax',
+    'SPINTAX_CACHE_SIZE': 'spintax',
+    'compile_spintax': 'spintax',
+    'template_hash': 'spintax',
+    'benchmark_spintax': 'spintax',
+    'JobQueue': 'jobs',
+    'DEFAULT_LEASE_TTL': 'jobs',
+    'AccountLease': 'jobs',
+    'DEFAULT_TASK_TTL': 'jobs',
+    'TaskLease': 'jobs',
+    'new_owner': 'jobs',
+    'TaskResult': 'engine',
+    'JobDeferred': 'engine',
+    'SharedCounters': 'engine',
+    'AudienceWriter': 'engine',
+    'AccountWriteError': 'engine',
+    'AccountWriter': 'engine',
+    'TaskEngine': 'engine',
+    'format_account_url': 'net',
+    'SessionPool': 'net',
+    'CircuitOpenError': 'net',
+    'RetryPolicy': 'net',
+    'CircuitBreaker': 'net',
+    'ProxyStats': 'net',
+    'ProxyPool': 'net',
+    'AsyncValidityChecker': 'async_check',
+    'DEFAULT_TASK_WORKERS': 'tasks',
+    'TASK_WORKERS_SETTINGS': 'tasks',
+    'DEFAULT_PIPELINE_QUEUE_SIZE': 'tasks',
+    'PROCESS_BATCH_SIZE': 'tasks',
+    'PROCESS_BATCH_INTERVAL': 'tasks',
+    'TaskManager': 'tasks',
+    'read_settings': 'settings',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,93 @@
+"""
+Операции с аккаунтами и аудиторией поверх DatabaseManager.
+"""
+import sqlite3
+
+from .db import DatabaseManager
+
+
+class AudienceParser:
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+
+    def save_parsed_audience(self, conn, audience_name: str, total_audience_count: int, processed_audience_count: int, audience_date: str) -> None:
+        try:
+            c = conn.cursor()
+            table_name = f"audience_{audience_name}"
+            c.execute(f"""
+                INSERT INTO {table_name} (audience_name, total_audience_count, processed_audience_count, audience_date)
+                VALUES (?, ?, ?, ?)
+            """, (audience_name, total_audience_count, processed_audience_count, audience_date))
+            conn.commit()
+            print(f"Audience data '{audience_name}' saved.")
+        except sqlite3.Error as e:
+            print(f"Error saving audience data: {e}")
+
+
+class AccountManager:
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+
+    def add_account(self, table_name: str, account: dict) -> None:
+        """
+        Добавляет аккаунт в таблицу.
+
+        Args:
+            table_name (str): Имя таблицы.
+            account (dict): Словарь с данными аккаунта.
+        """
+        self.db_manager.add_account(table_name, account)
+
+    def import_accounts(self, table_name: str, rows, progress_callback=None) -> int:
+        """
+        Массово добавляет аккаунты в таблицу.
+
+        Args:
+            table_name (str): Имя таблицы.
+            rows (iterable): Итерируемый набор словарей с данными аккаунтов.
+            progress_callback (callable): Вызывается с количеством добавленных аккаунтов.
+
+        Returns:
+            int: Количество добавленных аккаунтов.
+        """
+        return self.db_manager.import_accounts(table_name, rows, progress_callback=progress_callback)
+
+    def get_accounts(self, table_name: str) -> list:
+        """
+        Получает список всех аккаунтов из таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            list: Список словарей с данными аккаунтов.
+        """
+        return self.db_manager.get_accounts(table_name)
+
+    def update_account_status(self, table_name: str, account: dict, status: str = None):
+        """
+        Обновляет статус аккаунта в базе данных.
+
+        Args:
+            table_name (str): Имя таблицы.
+            account (dict): Словарь с данными аккаунта.
+            status (str): Результат проверки (необязательно).
+
+        Returns:
+            dict: Измененные поля аккаунта или None.
+        """
+        return self.db_manager.update_account_status(table_name, account, status)
+
+    def update_account_messages(self, table_name: str, account_id: int, messages_run: int):
+        """
+        Обновляет счетчик сообщений в базе данных.
+
+        Args:
+            table_name (str): Имя таблицы.
+            account_id (int): ID аккаунта.
+            messages_run (int): Количество сообщений для добавления.
+
+        Returns:
+            dict: Новые значения счетчиков аккаунта или None.
+        """
+        return self.db_manager.update_account_messages(table_name, account_id, messages_run)
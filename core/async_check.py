@@ -0,0 +1,245 @@
+"""
+Асинхронная проверка валидности аккаунтов (asyncio, без сторонних библиотек).
+"""
+import asyncio
+import base64
+import ssl
+import threading
+import time
+import urllib.parse
+
+from .net import CircuitOpenError, format_account_url
+
+
+class AsyncValidityChecker:
+    """
+    Асинхронная проверка валидности аккаунтов в одном цикле событий.
+
+    Тысячи проверок выполняются одновременно; число соединений ограничено
+    глобально (concurrency обработчиков общей очереди) и для каждого хоста
+    (per_host_limit), у каждого запроса есть таймаут. Адрес проверки задается шаблоном endpoint, в
+    который подставляются поля аккаунта, например
+    "http://127.0.0.1:8080/check?username={username}". Способ проверки
+    можно заменить, передав корутину checker(self, account) -> статус.
+
+    Запросы идут через те же механизмы, что и в потоках: временные сбои
+    повторяются по retry_policy (пауза asyncio.sleep, соединения на время
+    паузы освобождаются), предохранитель хоста берется из breaker_for(url),
+    каждая попытка идет через прокси из proxy_pool (поддерживаются HTTP-прокси).
+    """
+
+    # Сбои соединения, которые повторяются и считаются ошибкой прокси
+    TRANSIENT_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+    def __init__(self, endpoint: str, concurrency: int = 1000, per_host_limit: int = 100, timeout: float = 10.0, checker=None,
+                 retry_policy=None, breaker_for=None, proxy_pool=None):
+        """
+        Args:
+            retry_policy (RetryPolicy): Повторы временных сбоев; без нее - одна попытка.
+            breaker_for (callable): breaker_for(url) -> CircuitBreaker хоста (TaskManager.endpoint_breaker).
+            proxy_pool (ProxyPool): Пул прокси; без него запросы идут напрямую.
+        """
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.checker = checker or AsyncValidityChecker.http_status_checker
+        self.retry_policy = retry_policy
+        self.breaker_for = breaker_for
+        self.proxy_pool = proxy_pool
+        self._global_limit = None
+        self._host_limits = {}
+
+    def build_url(self, account: dict) -> str:
+        return format_account_url(self.endpoint, account)
+
+    async def fetch(self, url: str, headers: dict = None):
+        """
+        Выполняет GET-запрос с повторами, предохранителем и прокси (как TaskManager.request).
+
+        Returns:
+            tuple: (код ответа, тело ответа в байтах) последней попытки.
+
+        Raises:
+            CircuitOpenError: Если хост или все прокси временно отключены.
+        """
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        host_limit = self._host_limits.get((parts.hostname, port))
+        if host_limit is None:
+            host_limit = self._host_limits[(parts.hostname, port)] = asyncio.Semaphore(self.per_host_limit)
+        breaker = self.breaker_for(url) if self.breaker_for else None
+        policy = self.retry_policy
+        attempts = policy.attempts if policy else 1
+        for attempt in range(attempts):
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f"Эндпоинт '{parts.netloc}' временно отключен после серии ошибок")
+            try:
+                async with self._global_limit, host_limit:
+                    status, body = await self._fetch_via_proxy(parts, port, headers or {})
+            except self.TRANSIENT_ERRORS:
+                if breaker is not None and breaker.record_failure():
+                    print(f"Эндпоинт '{parts.netloc}' отключен на {breaker.reset_timeout:g} с.")
+                if attempt == attempts - 1:
+                    raise
+            except BaseException:
+                # Запрос не дошел до хоста (например, все прокси отключены): результата для предохранителя нет
+                if breaker is not None:
+                    breaker.release_probe()
+                raise
+            else:
+                transient = policy is not None and status in policy.RETRY_STATUSES
+                if breaker is not None:
+                    if not transient:
+                        breaker.record_success()
+                    elif breaker.record_failure():
+                        print(f"Эндпоинт '{parts.netloc}' отключен на {breaker.reset_timeout:g} с.")
+                if not transient or attempt == attempts - 1:
+                    return status, body
+            await asyncio.sleep(policy.delay(attempt))
+
+    async def _fetch_via_proxy(self, parts, port: int, headers: dict):
+        pool = self.proxy_pool
+        proxy = pool.acquire() if pool is not None else None
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._get(parts, port, headers, proxy), self.timeout)
+        except self.TRANSIENT_ERRORS:
+            if pool is not None:
+                pool.release(proxy, False)
+            raise
+        except BaseException:
+            if pool is not None:
+                pool.release(proxy, True, time.monotonic() - started)
+            raise
+        if pool is not None:
+            pool.release(proxy, True, time.monotonic() - started)
+        return result
+
+    async def _get(self, parts, port: int, headers: dict, proxy: str = None):
+        ssl_context = ssl.create_default_context() if parts.scheme == 'https' else None
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        lines = [f"Host: {parts.netloc}", "Connection: close"]
+        if proxy:
+            proxy_parts = urllib.parse.urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+            if proxy_parts.scheme != 'http':
+                raise ValueError(f"Асинхронная проверка поддерживает только HTTP-прокси: {proxy}")
+            auth = []
+            if proxy_parts.username:
+                credentials = f"{urllib.parse.unquote(proxy_parts.username)}:{urllib.parse.unquote(proxy_parts.password or '')}"
+                auth = [f"Proxy-Authorization: Basic {base64.b64encode(credentials.encode('utf-8')).decode('ascii')}"]
+            reader, writer = await asyncio.open_connection(proxy_parts.hostname, proxy_parts.port or 8080)
+        else:
+            reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=ssl_context)
+        try:
+            if proxy and ssl_context is not None:
+                # HTTPS через прокси: туннель CONNECT, затем TLS с хостом проверки
+                tunnel = [f"CONNECT {parts.hostname}:{port} HTTP/1.1", f"Host: {parts.hostname}:{port}"] + auth
+                writer.write(("\r\n".join(tunnel) + "\r\n\r\n").encode('utf-8'))
+                await writer.drain()
+                status, _ = await self._read_head(reader)
+                if status != 200:
+                    raise ConnectionError(f"Прокси отклонил туннель: {status}")
+                await writer.start_tls(ssl_context, server_hostname=parts.hostname)
+            elif proxy:
+                # HTTP через прокси: абсолютный адрес в строке запроса
+                path = urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path or '/', parts.query, ''))
+                lines += auth
+            lines = [f"GET {path} HTTP/1.1"] + lines
+            lines += [f"{name}: {value}" for name, value in headers.items() if value]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('utf-8'))
+            await writer.drain()
+
+            status, length = await self._read_head(reader)
+            body = await (reader.readexactly(length) if length is not None else reader.read())
+            return status, body
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_head(reader):
+        """
+        Читает строку статуса и заголовки ответа.
+
+        Returns:
+            tuple: (код ответа, Content-Length или None).
+        """
+        status_line = (await reader.readline()).split()
+        if len(status_line) < 2:
+            raise ConnectionError("Соединение закрыто без ответа")
+        status = int(status_line[1])
+        length = None
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value.strip())
+        return status, length
+
+    @staticmethod
+    async def http_status_checker(checker, account: dict) -> str:
+        """
+        Проверка по коду ответа: 200 - "Валидный", 401/403/404 - "Невалидный".
+        """
+        status, _ = await checker.fetch(checker.build_url(account), {'User-Agent': account.get('ua'), 'Cookie': account.get('cookie')})
+        if status == 200:
+            return "Валидный"
+        if status in (401, 403, 404):
+            return "Невалидный"
+        raise RuntimeError(f"Неожиданный ответ сервера: {status}")
+
+    async def check_many(self, accounts: list, on_result=None, stop_event: threading.Event = None) -> list:
+        """
+        Проверяет аккаунты конкурентно.
+
+        Args:
+            accounts (list): Список словарей с данными аккаунтов.
+            on_result (callable): Вызывается как on_result(account, status, error) по мере готовности.
+            stop_event (threading.Event): Событие остановки.
+
+        Returns:
+            list: Кортежи (account, status, error).
+        """
+        self._global_limit = asyncio.Semaphore(self.concurrency)
+        self._host_limits = {}
+        results = []
+
+        async def check(account):
+            if stop_event is not None and stop_event.is_set():
+                return
+            try:
+                status, error = await self.checker(self, account), None
+            except Exception as e:
+                status, error = None, e
+            results.append((account, status, error))
+            if on_result:
+                on_result(account, status, error)
+
+        # Аккаунты подаются в ограниченную очередь, которую разбирают concurrency
+        # обработчиков: новая проверка начинается, как только завершилась любая
+        # из идущих, а в памяти одновременно не больше concurrency ожидающих аккаунтов
+        queue = asyncio.Queue(maxsize=self.concurrency)
+
+        async def worker():
+            while True:
+                account = await queue.get()
+                if account is None:
+                    return
+                await check(account)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(accounts)))]
+        for account in accounts:
+            if stop_event is not None and stop_event.is_set():
+                break
+            await queue.put(account)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        return results
+
+    def run(self, accounts: list, on_result=None, stop_event: threading.Event = None) -> list:
+        return asyncio.run(self.check_many(accounts, on_result, stop_event))
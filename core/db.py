@@ -0,0 +1,1292 @@
+"""
+Хранилище: пул соединений SQLite, схема служебных таблиц и DatabaseManager.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+# Колонки таблицы аккаунтов (кроме id) в порядке отображения
+ACCOUNT_COLUMNS = ['username', 'password', 'ua', 'cookie', 'device', 'status_account', 'messages_total', 'messages_day', 'messages_run', 'color']
+
+# Колонки, добавленные в таблицы аккаунтов после первой версии
+ACCOUNT_EXTRA_COLUMNS = {'messages_date': 'TEXT', 'lease_owner': 'TEXT', 'lease_expires': 'REAL'}
+
+# Цвета строк для статусов аккаунтов
+STATUS_COLORS = {'Валидный': 'lightgreen', 'Невалидный': 'lightcoral'}
+
+# Миграции схемы служебных таблиц: версия -> SQL-скрипт или функция, принимающая соединение
+SCHEMA_MIGRATIONS = {
+    1: """
+        CREATE TABLE IF NOT EXISTS parsed_audience (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            audience_name TEXT NOT NULL,
+            total_audience_count INTEGER NOT NULL,
+            processed_audience_count INTEGER NOT NULL,
+            audience_date TEXT NOT NULL
+        );
+    """,
+    2: """
+        CREATE TABLE IF NOT EXISTS audience_ids (
+            id INTEGER PRIMARY KEY,
+            audience_name TEXT NOT NULL DEFAULT '',
+            audience_id INTEGER NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (audience_name, audience_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_audience_ids_unused ON audience_ids (audience_name, id) WHERE used = 0;
+        DROP INDEX IF EXISTS idx_parsed_audience_unused;
+    """,
+    3: """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_type TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            audience_name TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS task_jobs (
+            id INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            account_id INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at TEXT,
+            UNIQUE (task_id, account_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_task_jobs_pending ON task_jobs (task_id, id) WHERE state = 'pending';
+        CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state, task_type, table_name);
+    """,
+    4: """
+        CREATE TABLE IF NOT EXISTS account_groups (
+            name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0
+        );
+    """,
+}
+
+
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """
+    Выполняет SQL-скрипт по одному оператору в текущей транзакции.
+
+    В отличие от executescript не фиксирует открытую транзакцию, поэтому
+    миграция применяется целиком или не применяется вовсе.
+    """
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+    if statement.strip():
+        conn.execute(statement)
+
+
+def _migrate_to_accounts_table(conn: sqlite3.Connection) -> None:
+    """
+    Версия 5: общая таблица accounts с group_id вместо таблицы на каждую группу.
+
+    Группы из account_groups версии 4 помечаются legacy = 1: их аккаунты
+    переносит DatabaseManager.migrate_account_tables, не останавливая работу.
+    """
+    for (name,) in conn.execute("SELECT name FROM account_groups").fetchall():
+        # Триггеры версии 4 ссылаются на account_groups по имени группы и пересоздаются при регистрации
+        conn.execute(f"DROP TRIGGER IF EXISTS 'trg_{name}_count_insert'")
+        conn.execute(f"DROP TRIGGER IF EXISTS 'trg_{name}_count_delete'")
+    _execute_script(conn, """
+        CREATE TABLE account_groups_v5 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            legacy INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT INTO account_groups_v5 (name, row_count, legacy) SELECT name, row_count, 1 FROM account_groups;
+        DROP TABLE account_groups;
+        ALTER TABLE account_groups_v5 RENAME TO account_groups;
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER NOT NULL REFERENCES account_groups (id),
+            username TEXT,
+            password TEXT,
+            ua TEXT,
+            cookie TEXT,
+            device TEXT,
+            status_account TEXT,
+            messages_total INTEGER,
+            messages_day INTEGER,
+            messages_run INTEGER,
+            color TEXT,
+            messages_date TEXT,
+            lease_owner TEXT,
+            lease_expires REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_accounts_group_status ON accounts (group_id, status_account);
+        CREATE INDEX IF NOT EXISTS idx_accounts_group_id ON accounts (group_id, id);
+        CREATE INDEX IF NOT EXISTS idx_accounts_lease ON accounts (lease_owner) WHERE lease_owner IS NOT NULL;
+        CREATE TRIGGER IF NOT EXISTS trg_accounts_count_insert AFTER INSERT ON accounts
+        BEGIN
+            UPDATE account_groups SET row_count = row_count + 1 WHERE id = NEW.group_id AND legacy = 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_accounts_count_delete AFTER DELETE ON accounts
+        BEGIN
+            UPDATE account_groups SET row_count = row_count - 1 WHERE id = OLD.group_id AND legacy = 0;
+        END;
+        CREATE TABLE IF NOT EXISTS account_id_map (
+            group_id INTEGER NOT NULL,
+            legacy_id INTEGER NOT NULL,
+            account_id INTEGER NOT NULL,
+            PRIMARY KEY (group_id, legacy_id)
+        ) WITHOUT ROWID;
+    """)
+
+
+SCHEMA_MIGRATIONS[5] = _migrate_to_accounts_table
+
+# Версия 6: владелец задачи и отметка его активности (TaskLease), фильтр аккаунтов по статусу
+SCHEMA_MIGRATIONS[6] = """
+    ALTER TABLE tasks ADD COLUMN owner TEXT;
+    ALTER TABLE tasks ADD COLUMN heartbeat REAL;
+    ALTER TABLE tasks ADD COLUMN account_status TEXT;
+"""
+
+# Версия 7: резерв ID аудитории за отправителем до отправки (владелец и срок),
+# used = 1 ставится только после отправки
+SCHEMA_MIGRATIONS[7] = """
+    ALTER TABLE audience_ids ADD COLUMN claim_owner TEXT;
+    ALTER TABLE audience_ids ADD COLUMN claim_expires REAL;
+    CREATE INDEX IF NOT EXISTS idx_audience_ids_claims ON audience_ids (claim_owner) WHERE claim_owner IS NOT NULL;
+"""
+
+# Версия 8: зерно и позиция перестановки спинтакса по хэшу шаблона, чтобы
+# тексты не повторялись между запусками и процессами
+SCHEMA_MIGRATIONS[8] = """
+    CREATE TABLE IF NOT EXISTS spintax_state (
+        template_hash TEXT PRIMARY KEY,
+        seed INTEGER NOT NULL,
+        position INTEGER NOT NULL DEFAULT 0
+    );
+"""
+
+# Служебные таблицы, которые не являются группами аккаунтов
+SERVICE_TABLES = {'sqlite_sequence', 'parsed_audience', 'audience_ids', 'tasks', 'task_jobs', 'account_groups', 'accounts', 'account_id_map',
+                  'spintax_state'}
+
+# Колонки, переносимые из таблиц старого формата в accounts
+MIGRATED_COLUMNS = ACCOUNT_COLUMNS + list(ACCOUNT_EXTRA_COLUMNS)
+
+# Сколько аккаунтов переносится одной транзакцией и пауза между пачками (с),
+# за которую другие соединения успевают записать свои изменения
+ACCOUNT_MIGRATION_BATCH = 2000
+ACCOUNT_MIGRATION_PAUSE = 0.01
+
+# Через сколько секунд непродленный резерв ID аудитории истекает и ID снова доступен
+DEFAULT_AUDIENCE_CLAIM_TTL = 600.0
+
+
+class ConnectionPool:
+    """
+    Пул соединений SQLite: у каждого потока своё соединение.
+
+    Соединения открываются в режиме WAL, поэтому чтение из GUI-потока
+    не блокируется записью из потоков задач.
+    """
+
+    def __init__(self, db_file: str, busy_timeout: float = 5.0):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        if self.db_file != ':memory:':
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока, открывая его при первом обращении.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+        return conn
+
+    def release(self) -> None:
+        """
+        Закрывает соединение текущего потока (вызывается при завершении потока задачи).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.pop(threading.get_ident(), None)
+            conn.close()
+
+    def close_all(self) -> None:
+        """
+        Закрывает все открытые соединения пула.
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+class DatabaseManager:
+    def __init__(self, db_file: str, busy_timeout: float = 5.0):
+        self.db_file = db_file
+        self.pool = ConnectionPool(db_file, busy_timeout)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        Соединение текущего потока.
+        """
+        return self.pool.get()
+
+    def connect(self):
+        try:
+            return self.pool.get()
+        except sqlite3.Error as e:
+            print(f"Database connection error: {e}")
+            return None
+
+    def release(self) -> None:
+        """
+        Освобождает соединение текущего потока.
+        """
+        self.pool.release()
+
+    def close(self) -> None:
+        """
+        Закрывает все соединения с базой данных.
+        """
+        self.pool.close_all()
+
+    def create_audience_table(self, conn, audience_name: str):
+        try:
+            c = conn.cursor()
+            table_name = f"audience_{audience_name}"
+            c.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    audience_name TEXT NOT NULL,
+                    total_audience_count INTEGER NOT NULL,
+                    processed_audience_count INTEGER NOT NULL,
+                    audience_date TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+            print(f"Table '{table_name}' created.")
+        except sqlite3.Error as e:
+            print(f"Error creating table: {e}")
+
+
+
+    def add_column(self, table_name: str, column_name: str, column_type: str) -> None:
+        """
+        Добавляет новую колонку в таблицу.
+
+        Args:
+            table_name (str): Имя таблицы.
+            column_name (str): Имя новой колонки.
+            column_type (str): Тип данных новой колонки.
+        """
+        try:
+            c = self.conn.cursor()
+            c.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+            self.conn.commit()
+            print(f"Колонка '{column_name}' добавлена в таблицу '{table_name}'.")
+        except sqlite3.Error as e:
+            print(f"Ошибка при добавлении колонки '{column_name}': {e}")
+
+
+    def create_table(self, table_name: str) -> None:
+        """
+        Создает группу аккаунтов (запись в account_groups; аккаунты всех групп
+        хранятся в общей таблице accounts).
+
+        Args:
+            table_name (str): Имя группы.
+        """
+        try:
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO account_groups (name) VALUES (?)", (table_name,))
+            print(f"Таблица '{table_name}' создана.")
+        except sqlite3.Error as e:
+            print(f"Ошибка при создании таблицы: {e}")
+
+    def get_group_id(self, table_name: str):
+        """
+        Возвращает id группы в account_groups или None, если группа не найдена.
+        """
+        row = self.conn.execute("SELECT id FROM account_groups WHERE name = ?", (table_name,)).fetchone()
+        return row[0] if row else None
+
+    def _account_source(self, table_name: str) -> tuple:
+        """
+        Определяет, где хранятся аккаунты группы.
+
+        Returns:
+            tuple: (таблица для FROM/UPDATE, условие отбора группы, параметры условия):
+                ("accounts", "group_id = ?", (group_id,)) для перенесенной группы и
+                ("'имя'", "1", ()) для таблицы старого формата, еще не перенесенной в accounts.
+        """
+        row = self.conn.execute("SELECT id, legacy FROM account_groups WHERE name = ?", (table_name,)).fetchone()
+        if row is None or row[1]:
+            return f"'{table_name}'", "1", ()
+        return "accounts", "group_id = ?", (row[0],)
+
+    def _account_insert(self, table_name: str) -> tuple:
+        """
+        Возвращает запрос вставки аккаунта в группу и параметры, предшествующие значениям колонок.
+        """
+        source, group, params = self._account_source(table_name)
+        columns = ', '.join(ACCOUNT_COLUMNS)
+        placeholders = ', '.join('?' * len(ACCOUNT_COLUMNS))
+        if params:
+            return f"INSERT INTO accounts (group_id, {columns}) VALUES (?, {placeholders})", params
+        return f"INSERT INTO {source} ({columns}) VALUES ({placeholders})", ()
+
+    def _register_legacy_tables(self) -> None:
+        """
+        Заносит в account_groups таблицы аккаунтов старого формата (по таблице на группу),
+        чтобы их перенесла migrate_account_tables.
+
+        Счетчик id общей таблицы сдвигается выше id старых таблиц: id, запомненные
+        до переноса (например, в открытой вкладке), не совпадут с перенесенными аккаунтами.
+        """
+        conn = self.conn
+        try:
+            registered = {row[0] for row in conn.execute("SELECT name FROM account_groups")}
+            tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY rowid")
+                      if row[0] not in SERVICE_TABLES and not row[0].startswith('audience_')]
+            max_id = 0
+            with conn:
+                for table_name in tables:
+                    if table_name not in registered:
+                        columns = {row[1] for row in conn.execute(f"PRAGMA table_info('{table_name}')")}
+                        if 'status_account' not in columns:
+                            continue
+                        row_count = conn.execute(f"SELECT COUNT(*) FROM '{table_name}'").fetchone()[0]
+                        conn.execute("INSERT INTO account_groups (name, row_count, legacy) VALUES (?, ?, 1)", (table_name, row_count))
+                        registered.add(table_name)
+                    group_id, legacy = conn.execute("SELECT id, legacy FROM account_groups WHERE name = ?", (table_name,)).fetchone()
+                    if not legacy:
+                        continue
+                    for action, sign, ref in (('INSERT', '+', 'NEW'), ('DELETE', '-', 'OLD')):
+                        conn.execute(f"""
+                            CREATE TRIGGER IF NOT EXISTS 'trg_{table_name}_count_{action.lower()}' AFTER {action} ON '{table_name}'
+                            BEGIN
+                                UPDATE account_groups SET row_count = row_count {sign} 1 WHERE id = {group_id};
+                            END
+                        """)
+                    max_id = max(max_id, conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM '{table_name}'").fetchone()[0])
+                if max_id:
+                    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'accounts'").fetchone()
+                    if seq is None:
+                        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('accounts', ?)", (max_id,))
+                    elif seq[0] < max_id:
+                        conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'accounts'", (max_id,))
+        except sqlite3.Error as e:
+            print(f"Ошибка при регистрации таблиц аккаунтов: {e}")
+
+    def get_account_groups(self) -> list:
+        """
+        Возвращает группы аккаунтов с количеством строк из account_groups (без обращения к данным).
+
+        Returns:
+            list: Кортежи (имя группы, количество аккаунтов) в порядке создания групп.
+        """
+        try:
+            return self.conn.execute("SELECT name, row_count FROM account_groups ORDER BY id").fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении списка таблиц аккаунтов: {e}")
+            return []
+
+    def ensure_account_columns(self, table_name: str) -> None:
+        """
+        Добавляет в таблицу аккаунтов старого формата колонки, появившиеся в новых версиях.
+        Для групп в общей таблице accounts ничего не делает.
+        """
+        try:
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info('{table_name}')")}
+        except sqlite3.Error as e:
+            print(f"Ошибка при чтении структуры таблицы: {e}")
+            return
+        if not existing:
+            return
+        for column_name, column_type in ACCOUNT_EXTRA_COLUMNS.items():
+            if column_name not in existing:
+                self.add_column(table_name, column_name, column_type)
+        if 'lease_owner' not in existing:
+            try:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS 'idx_{table_name}_lease' ON '{table_name}' (lease_owner)")
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Ошибка при создании индекса аренды: {e}")
+
+    def add_account(self, table_name: str, account: dict) -> None:
+        """
+        Добавляет аккаунт в таблицу.
+
+        Args:
+            table_name (str): Имя таблицы.
+            account (dict): Словарь с данными аккаунта.
+        """
+        try:
+            query, params = self._account_insert(table_name)
+            c = self.conn.cursor()
+            c.execute(query, (*params, account['username'], account['password'], account.get('ua', ''), account.get('cookie', ''), account.get('device', ''), 'Не проверено', 0, 0, 0, ''))
+            self.conn.commit()
+            print(f"Аккаунт '{account['username']}' добавлен в таблицу '{table_name}'.")
+        except sqlite3.Error as e:
+            print(f"Ошибка при добавлении аккаунта: {e}")
+
+    def import_accounts(self, table_name: str, rows, chunk_size: int = 5000, progress_callback=None) -> int:
+        """
+        Массово добавляет аккаунты в таблицу одной транзакцией.
+
+        Строки читаются потоково (например, из csv.DictReader) и записываются
+        пачками через executemany.
+
+        Args:
+            table_name (str): Имя таблицы.
+            rows (iterable): Итерируемый набор словарей с данными аккаунтов.
+            chunk_size (int): Размер пачки для executemany.
+            progress_callback (callable): Вызывается с количеством добавленных аккаунтов после каждой пачки.
+
+        Returns:
+            int: Количество добавленных аккаунтов.
+        """
+        conn = self.conn
+        imported = 0
+        chunk = []
+        try:
+            query, params = self._account_insert(table_name)
+            with conn:
+                for account in rows:
+                    chunk.append((*params, account['username'], account['password'], account.get('ua', ''), account.get('cookie', ''), account.get('device', ''), 'Не проверено', 0, 0, 0, ''))
+                    if len(chunk) >= chunk_size:
+                        conn.executemany(query, chunk)
+                        imported += len(chunk)
+                        chunk = []
+                        if progress_callback:
+                            progress_callback(imported)
+                if chunk:
+                    conn.executemany(query, chunk)
+                    imported += len(chunk)
+                    if progress_callback:
+                        progress_callback(imported)
+            print(f"В таблицу '{table_name}' добавлено аккаунтов: {imported}.")
+            return imported
+        except sqlite3.Error as e:
+            print(f"Ошибка при массовом добавлении аккаунтов: {e}")
+            return 0
+
+    def get_accounts(self, table_name: str) -> list:
+        """
+        Получает список всех аккаунтов из таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            list: Список словарей с данными аккаунтов.
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            c = self.conn.cursor()
+            c.execute(f"SELECT * FROM {source} WHERE {group} ORDER BY id", params)
+            rows = c.fetchall()
+            accounts = [dict(zip([column[0] for column in c.description], row)) for row in rows]
+            print(f"Список аккаунтов из таблицы '{table_name}' получен.")
+            return accounts
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении списка аккаунтов: {e}")
+            return []
+
+    def get_account_ids(self, table_name: str, status: str = None) -> list:
+        """
+        Получает id аккаунтов таблицы (всех или только с указанным статусом).
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            if status is None:
+                return [row[0] for row in self.conn.execute(f"SELECT id FROM {source} WHERE {group} ORDER BY id", params)]
+            return [row[0] for row in self.conn.execute(f"SELECT id FROM {source} WHERE {group} AND status_account = ? ORDER BY id", (*params, status))]
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении id аккаунтов: {e}")
+            return []
+
+    def get_accounts_by_ids(self, table_name: str, account_ids: list) -> list:
+        """
+        Получает аккаунты по списку id (в порядке возрастания id).
+        """
+        accounts = []
+        try:
+            source, group, params = self._account_source(table_name)
+            # SQLite ограничивает число параметров запроса, поэтому id передаются частями
+            for start in range(0, len(account_ids), 500):
+                chunk = account_ids[start:start + 500]
+                c = self.conn.execute(f"SELECT * FROM {source} WHERE {group} AND id IN ({', '.join('?' * len(chunk))}) ORDER BY id", (*params, *chunk))
+                columns = [column[0] for column in c.description]
+                accounts.extend(dict(zip(columns, row)) for row in c.fetchall())
+            return accounts
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении аккаунтов: {e}")
+            return []
+
+    def count_accounts(self, table_name: str) -> int:
+        """
+        Возвращает количество аккаунтов в таблице (из account_groups, если группа зарегистрирована).
+        """
+        try:
+            row = self.conn.execute("SELECT row_count FROM account_groups WHERE name = ?", (table_name,)).fetchone()
+            if row is not None:
+                return row[0]
+            return self.conn.execute(f"SELECT COUNT(*) FROM '{table_name}'").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете аккаунтов: {e}")
+            return 0
+
+    def count_accounts_by_status(self) -> dict:
+        """
+        Считает аккаунты всех групп по статусам.
+
+        Для групп в общей таблице это один запрос по индексу (group_id, status_account);
+        таблицы старого формата, еще не перенесенные, считаются по отдельности.
+
+        Returns:
+            dict: {имя группы: {статус: количество}}.
+        """
+        counts = {}
+        try:
+            for name, status, count in self.conn.execute("""
+                SELECT g.name, a.status_account, COUNT(*)
+                FROM accounts a JOIN account_groups g ON g.id = a.group_id
+                GROUP BY a.group_id, a.status_account
+            """):
+                counts.setdefault(name, {})[status] = count
+            for (name,) in self.conn.execute("SELECT name FROM account_groups WHERE legacy = 1").fetchall():
+                for status, count in self.conn.execute(f"SELECT status_account, COUNT(*) FROM '{name}' GROUP BY status_account"):
+                    counts.setdefault(name, {})[status] = count
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете аккаунтов по статусам: {e}")
+        return counts
+
+    def get_account_rows(self, table_name: str, after_id: int = 0, limit: int = 500) -> list:
+        """
+        Получает страницу аккаунтов с id больше after_id (постраничная выборка по ключу).
+
+        Returns:
+            list: Кортежи (id, username, ..., color) в порядке ACCOUNT_COLUMNS.
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            c = self.conn.execute(f"SELECT id, {', '.join(ACCOUNT_COLUMNS)} FROM {source} WHERE {group} AND id > ? ORDER BY id LIMIT ?", (*params, after_id, limit))
+            return c.fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении страницы аккаунтов: {e}")
+            return []
+
+    def get_account_rows_between(self, table_name: str, first_id: int, last_id: int) -> list:
+        """
+        Получает аккаунты с id в диапазоне [first_id, last_id].
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            c = self.conn.execute(f"SELECT id, {', '.join(ACCOUNT_COLUMNS)} FROM {source} WHERE {group} AND id BETWEEN ? AND ? ORDER BY id", (*params, first_id, last_id))
+            return c.fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении аккаунтов: {e}")
+            return []
+
+    def delete_accounts(self, table_name: str, account_ids: list) -> None:
+        """
+        Удаляет аккаунты по id одной транзакцией.
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            with self.conn:
+                self.conn.executemany(f"DELETE FROM {source} WHERE {group} AND id = ?", [(*params, account_id) for account_id in account_ids])
+            print(f"Из таблицы '{table_name}' удалено строк: {len(account_ids)}.")
+        except sqlite3.Error as e:
+            print(f"Ошибка при удалении строк: {e}")
+
+    def update_account_status(self, table_name: str, account: dict, status: str = None):
+        """
+        Обновляет статус аккаунта в таблице.
+
+        Args:
+            table_name (str): Имя таблицы.
+            account (dict): Словарь с данными аккаунта.
+            status (str): Результат проверки; если не указан, используется check_account_status.
+
+        Returns:
+            dict: Измененные поля аккаунта или None, если статус не обновлен.
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            c = self.conn.cursor()
+            # Занятость аккаунта другими задачами исключается арендой (lease_accounts)
+            status = status or self.check_account_status(account)
+            color = STATUS_COLORS[status]
+
+            c.execute(f"UPDATE {source} SET status_account = ?, color = ? WHERE {group} AND id = ?", (status, color, *params, account['id']))
+            self.conn.commit()
+            print(f"Статус аккаунта '{account['username']}' обновлен в таблице '{table_name}'.")
+            return {'status_account': status, 'color': color}
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении статуса аккаунта: {e}")
+            return None
+
+    def update_account_messages(self, table_name: str, account_id: int, messages_run: int):
+        """
+        Увеличивает счетчики сообщений аккаунта (дневной счетчик сбрасывается при смене даты).
+
+        Args:
+            table_name (str): Имя таблицы.
+            account_id (int): ID аккаунта.
+            messages_run (int): Количество сообщений для добавления.
+
+        Returns:
+            dict: Новые значения счетчиков аккаунта или None.
+        """
+        today = time.strftime('%Y-%m-%d')
+        try:
+            source, group, params = self._account_source(table_name)
+            c = self.conn.cursor()
+            c.execute(f"""
+                UPDATE {source}
+                SET messages_run = messages_run + ?,
+                    messages_total = messages_total + ?,
+                    messages_day = CASE WHEN messages_date = ? THEN messages_day + ? ELSE ? END,
+                    messages_date = ?
+                WHERE {group} AND id = ?
+            """, (messages_run, messages_run, today, messages_run, messages_run, today, *params, account_id))
+            c.execute(f"SELECT messages_total, messages_day, messages_run FROM {source} WHERE {group} AND id = ?", (*params, account_id))
+            counters = c.fetchone()
+            self.conn.commit()
+            print(f"Счетчик сообщений для аккаунта '{account_id}' обновлен.")
+            if counters is None:
+                return None
+            return dict(zip(('messages_total', 'messages_day', 'messages_run'), counters))
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении счетчика сообщений: {e}")
+            return None
+
+    def apply_account_updates(self, table_name: str, statuses: dict, messages: dict) -> dict:
+        """
+        Записывает накопленные изменения аккаунтов одной транзакцией.
+
+        Args:
+            table_name (str): Имя таблицы.
+            statuses (dict): account_id -> новый статус.
+            messages (dict): account_id -> сколько сообщений добавить к счетчикам.
+
+        Returns:
+            dict: account_id -> новые значения счетчиков сообщений (для аккаунтов из messages)
+                или None, если изменения не записаны.
+        """
+        today = time.strftime('%Y-%m-%d')
+        counters = {}
+        try:
+            source, group, params = self._account_source(table_name)
+            conn = self.conn
+            with conn:
+                conn.executemany(f"UPDATE {source} SET status_account = ?, color = ? WHERE {group} AND id = ?",
+                                 [(status, STATUS_COLORS.get(status, ''), *params, account_id) for account_id, status in statuses.items()])
+                conn.executemany(f"""
+                    UPDATE {source}
+                    SET messages_run = messages_run + ?,
+                        messages_total = messages_total + ?,
+                        messages_day = CASE WHEN messages_date = ? THEN messages_day + ? ELSE ? END,
+                        messages_date = ?
+                    WHERE {group} AND id = ?
+                """, [(count, count, today, count, count, today, *params, account_id) for account_id, count in messages.items()])
+                account_ids = list(messages)
+                for start in range(0, len(account_ids), 500):
+                    chunk = account_ids[start:start + 500]
+                    for account_id, *values in conn.execute(
+                            f"SELECT id, messages_total, messages_day, messages_run FROM {source} WHERE {group} AND id IN ({', '.join('?' * len(chunk))})",
+                            (*params, *chunk)):
+                        counters[account_id] = dict(zip(('messages_total', 'messages_day', 'messages_run'), values))
+        except sqlite3.Error as e:
+            print(f"Ошибка при записи изменений аккаунтов: {e}")
+            return None
+        return counters
+
+    def lease_accounts(self, table_name: str, owner: str, ttl: float, account_ids: list = None, limit: int = None) -> list:
+        """
+        Атомарно берет в аренду свободные аккаунты.
+
+        Аккаунт свободен, если у него нет владельца или аренда истекла.
+        Аккаунты, уже арендованные этим же владельцем, продлеваются.
+
+        Args:
+            table_name (str): Имя таблицы.
+            owner (str): Идентификатор задачи-владельца.
+            ttl (float): Срок аренды в секундах.
+            account_ids (list): Какие аккаунты арендовать; если не указаны,
+                берутся любые свободные в количестве limit.
+            limit (int): Сколько свободных аккаунтов арендовать.
+
+        Returns:
+            list: id арендованных аккаунтов.
+        """
+        now = time.time()
+        free = "(lease_owner IS NULL OR lease_owner = ? OR lease_expires < ?)"
+        conn = self.conn
+        leased = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Источник определяется внутри транзакции: перенос группы в accounts не может произойти между выборкой и арендой
+                source, group, params = self._account_source(table_name)
+                if account_ids is None:
+                    chunks = [(f"SELECT id FROM {source} WHERE {group} AND {free} ORDER BY id LIMIT ?", (*params, owner, now, limit or -1))]
+                else:
+                    chunks = []
+                    for start in range(0, len(account_ids), 500):
+                        chunk = list(account_ids[start:start + 500])
+                        chunks.append((f"SELECT id FROM {source} WHERE {group} AND id IN ({', '.join('?' * len(chunk))}) AND {free}",
+                                       (*params, *chunk, owner, now)))
+                for select, select_params in chunks:
+                    ids = [row[0] for row in conn.execute(select, select_params)]
+                    conn.executemany(f"UPDATE {source} SET lease_owner = ?, lease_expires = ? WHERE id = ?",
+                                     [(owner, now + ttl, account_id) for account_id in ids])
+                    leased.extend(ids)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        except sqlite3.Error as e:
+            print(f"Ошибка при аренде аккаунтов: {e}")
+            return []
+        return leased
+
+    def renew_account_leases(self, table_name: str, owner: str, ttl: float) -> int:
+        """
+        Продлевает все аренды владельца.
+
+        Returns:
+            int: Число продленных аренд.
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            with self.conn:
+                c = self.conn.execute(f"UPDATE {source} SET lease_expires = ? WHERE {group} AND lease_owner = ?", (time.time() + ttl, *params, owner))
+            return c.rowcount
+        except sqlite3.Error as e:
+            print(f"Ошибка при продлении аренды аккаунтов: {e}")
+            return 0
+
+    def release_account_leases(self, table_name: str, owner: str, account_ids: list = None) -> None:
+        """
+        Освобождает аренды владельца (все или только указанные аккаунты).
+        """
+        try:
+            source, group, params = self._account_source(table_name)
+            with self.conn:
+                if account_ids is None:
+                    self.conn.execute(f"UPDATE {source} SET lease_owner = NULL, lease_expires = NULL WHERE {group} AND lease_owner = ?", (*params, owner))
+                else:
+                    self.conn.executemany(f"UPDATE {source} SET lease_owner = NULL, lease_expires = NULL WHERE {group} AND id = ? AND lease_owner = ?",
+                                          [(*params, account_id, owner) for account_id in account_ids])
+        except sqlite3.Error as e:
+            print(f"Ошибка при освобождении аренды аккаунтов: {e}")
+
+    def set_account_statuses(self, table_name: str, statuses: list) -> None:
+        """
+        Записывает статусы нескольких аккаунтов одной транзакцией.
+
+        Args:
+            table_name (str): Имя таблицы.
+            statuses (list): Пары (account_id, status).
+        """
+        if not statuses:
+            return
+        try:
+            source, group, params = self._account_source(table_name)
+            with self.conn:
+                self.conn.executemany(f"UPDATE {source} SET status_account = ?, color = ? WHERE {group} AND id = ?",
+                                      [(status, STATUS_COLORS.get(status, ''), *params, account_id) for account_id, status in statuses])
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении статусов аккаунтов: {e}")
+
+    def delete_table(self, table_name: str) -> None:
+        """
+        Удаляет группу аккаунтов вместе с ее аккаунтами.
+
+        Args:
+            table_name (str): Имя таблицы.
+        """
+        try:
+            conn = self.conn
+            with conn:
+                row = conn.execute("SELECT id, legacy FROM account_groups WHERE name = ?", (table_name,)).fetchone()
+                if row is None or row[1]:
+                    conn.execute(f"DROP TABLE IF EXISTS '{table_name}'")
+                if row is not None:
+                    conn.execute("DELETE FROM accounts WHERE group_id = ?", (row[0],))
+                    conn.execute("DELETE FROM account_id_map WHERE group_id = ?", (row[0],))
+                    conn.execute("DELETE FROM account_groups WHERE id = ?", (row[0],))
+            print(f"Таблица '{table_name}' удалена.")
+        except sqlite3.Error as e:
+            print(f"Ошибка при удалении таблицы: {e}")
+
+    def check_account_status(self, account: dict) -> str:
+        """
+        Проверяет статус аккаунта (временная функция).
+
+        Args:
+            account (dict): Словарь с данными аккаунта.
+
+        Returns:
+            str: Статус аккаунта ("Валидный" или "Невалидный").
+        """
+        status = "Валидный" if random.randint(1, 2) == 1 else "Невалидный"
+        return status
+
+    def migrate(self) -> None:
+        """
+        Приводит схему служебных таблиц к актуальной версии (PRAGMA user_version).
+
+        Каждая миграция выполняется одной транзакцией BEGIN IMMEDIATE вместе с
+        записью новой версии: прерванная миграция откатывается целиком, а
+        второй процесс, запущенный одновременно, дожидается ее и не применяет
+        ее повторно.
+        """
+        conn = self.conn
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target in sorted(SCHEMA_MIGRATIONS):
+                if target <= version:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                    if target > version:
+                        migration = SCHEMA_MIGRATIONS[target]
+                        if callable(migration):
+                            migration(conn)
+                        else:
+                            _execute_script(conn, migration)
+                        conn.execute(f"PRAGMA user_version = {target}")
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                if target > version:
+                    print(f"Схема базы данных обновлена до версии {target}.")
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении схемы базы данных: {e}")
+            return
+        self._register_legacy_tables()
+
+    def migrate_account_tables(self, batch_size: int = ACCOUNT_MIGRATION_BATCH, pause: float = ACCOUNT_MIGRATION_PAUSE,
+                               stop_event: threading.Event = None, retry_interval: float = None, on_group_migrated=None) -> list:
+        """
+        Переносит аккаунты из таблиц старого формата в общую таблицу accounts.
+
+        Перенос идет без остановки работы: аккаунты копируются пачками по
+        batch_size в коротких транзакциях, а изменения уже скопированных строк
+        повторяются в accounts триггерами. Пока группа переносится, запросы к ней
+        идут в старую таблицу. Группа переключается на accounts одной транзакцией
+        (с переводом id в task_jobs на новые), когда ни один ее аккаунт не арендован.
+
+        Args:
+            batch_size (int): Сколько аккаунтов переносить одной транзакцией.
+            pause (float): Пауза между пачками, чтобы перенос не занимал запись в базу целиком.
+            stop_event (threading.Event): Прерывает перенос между пачками; продолжается при следующем запуске.
+            retry_interval (float): Через сколько секунд повторять переключение групп
+                с арендованными аккаунтами; если не указан, такие группы остаются до следующего запуска.
+            on_group_migrated (callable): Вызывается с именем группы после ее переключения.
+
+        Returns:
+            list: Имена групп, оставшихся в старом формате.
+        """
+        stop_event = stop_event or threading.Event()
+        try:
+            pending = [row[0] for row in self.conn.execute("SELECT name FROM account_groups WHERE legacy = 1 ORDER BY id")]
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении таблиц для переноса: {e}")
+            return []
+        while pending and not stop_event.is_set():
+            deferred = []
+            for table_name in pending:
+                if stop_event.is_set():
+                    deferred.append(table_name)
+                    continue
+                try:
+                    if self._migrate_account_table(table_name, batch_size, pause, stop_event):
+                        print(f"Таблица '{table_name}' перенесена в accounts.")
+                        if on_group_migrated:
+                            on_group_migrated(table_name)
+                    else:
+                        deferred.append(table_name)
+                except sqlite3.Error as e:
+                    print(f"Ошибка при переносе таблицы '{table_name}': {e}")
+            pending = deferred
+            if retry_interval is None:
+                break
+            if pending:
+                stop_event.wait(retry_interval)
+        return pending
+
+    def _migrate_account_table(self, table_name: str, batch_size: int, pause: float, stop_event: threading.Event) -> bool:
+        """
+        Переносит одну группу; возвращает True, если группа переключена на accounts.
+        """
+        conn = self.conn
+        row = conn.execute("SELECT id FROM account_groups WHERE name = ? AND legacy = 1", (table_name,)).fetchone()
+        if row is None:
+            return False
+        group_id = row[0]
+        self.ensure_account_columns(table_name)
+        mapped = f"(SELECT account_id FROM account_id_map WHERE group_id = {group_id} AND legacy_id = {{}}.id)"
+        with conn:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS 'trg_{table_name}_migrate_update' AFTER UPDATE ON '{table_name}'
+                BEGIN
+                    UPDATE accounts SET {', '.join(f'{column} = NEW.{column}' for column in MIGRATED_COLUMNS)}
+                    WHERE id = {mapped.format('NEW')};
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS 'trg_{table_name}_migrate_delete' AFTER DELETE ON '{table_name}'
+                BEGIN
+                    DELETE FROM accounts WHERE id = {mapped.format('OLD')};
+                    DELETE FROM account_id_map WHERE group_id = {group_id} AND legacy_id = OLD.id;
+                END
+            """)
+        while not stop_event.is_set():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                copied = self._copy_account_batch(table_name, group_id, batch_size)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            if copied < batch_size:
+                break
+            stop_event.wait(pause)
+        if stop_event.is_set():
+            return False
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Строки, добавленные после последней пачки
+            while self._copy_account_batch(table_name, group_id, batch_size):
+                pass
+            if conn.execute(f"SELECT 1 FROM '{table_name}' WHERE lease_owner IS NOT NULL AND lease_expires >= ? LIMIT 1", (time.time(),)).fetchone():
+                conn.rollback()
+                print(f"Таблица '{table_name}' используется задачей, переключение отложено.")
+                return False
+            conn.execute("""
+                UPDATE task_jobs
+                SET account_id = (SELECT m.account_id FROM account_id_map m WHERE m.group_id = ? AND m.legacy_id = task_jobs.account_id)
+                WHERE task_id IN (SELECT id FROM tasks WHERE table_name = ?)
+                  AND account_id IN (SELECT legacy_id FROM account_id_map WHERE group_id = ?)
+            """, (group_id, table_name, group_id))
+            conn.execute(f"DROP TABLE '{table_name}'")
+            conn.execute("DELETE FROM account_id_map WHERE group_id = ?", (group_id,))
+            conn.execute("UPDATE account_groups SET legacy = 0, row_count = (SELECT COUNT(*) FROM accounts WHERE group_id = ?) WHERE id = ?",
+                         (group_id, group_id))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return True
+
+    def _copy_account_batch(self, table_name: str, group_id: int, batch_size: int) -> int:
+        """
+        Копирует в accounts следующую пачку еще не перенесенных строк (вызывается внутри транзакции).
+        """
+        conn = self.conn
+        last_id = conn.execute("SELECT COALESCE(MAX(legacy_id), 0) FROM account_id_map WHERE group_id = ?", (group_id,)).fetchone()[0]
+        rows = conn.execute(f"SELECT id, {', '.join(MIGRATED_COLUMNS)} FROM '{table_name}' WHERE id > ? ORDER BY id LIMIT ?",
+                            (last_id, batch_size)).fetchall()
+        insert = f"INSERT INTO accounts (group_id, {', '.join(MIGRATED_COLUMNS)}) VALUES (?, {', '.join('?' * len(MIGRATED_COLUMNS))})"
+        for row in rows:
+            account_id = conn.execute(insert, (group_id, *row[1:])).lastrowid
+            conn.execute("INSERT INTO account_id_map (group_id, legacy_id, account_id) VALUES (?, ?, ?)", (group_id, row[0], account_id))
+        return len(rows)
+
+    def add_audience_id(self, audience_name: str, audience_id) -> None:
+        """
+        Добавляет ID в аудиторию (повторы игнорируются).
+
+        Args:
+            audience_name (str): Имя аудитории.
+            audience_id: ID аудитории.
+        """
+        self.add_audience_ids(audience_name, [audience_id])
+
+    def add_audience_ids(self, audience_name: str, audience_ids) -> int:
+        """
+        Добавляет пачку ID в аудиторию одной транзакцией (повторы игнорируются).
+
+        Args:
+            audience_name (str): Имя аудитории.
+            audience_ids (iterable): ID аудитории.
+
+        Returns:
+            int: Количество действительно добавленных ID.
+        """
+        try:
+            with self.conn:
+                c = self.conn.executemany("INSERT OR IGNORE INTO audience_ids (audience_name, audience_id) VALUES (?, ?)", ((audience_name, audience_id) for audience_id in audience_ids))
+            return c.rowcount
+        except sqlite3.Error as e:
+            print(f"Ошибка при добавлении ID аудитории: {e}")
+            return 0
+
+    def claim_new_audience_ids(self, audience_name: str, audience_ids, owner: str = None,
+                               ttl: float = DEFAULT_AUDIENCE_CLAIM_TTL) -> list:
+        """
+        Добавляет ID в аудиторию сразу зарезервированными за owner (как claim_audience_ids).
+
+        Возвращаются только действительно добавленные ID: уже известные
+        аудитории (в том числе отправленные раньше или найденные другим
+        аккаунтом) отбрасываются, поэтому каждый ID достается одному отправителю.
+
+        Args:
+            audience_name (str): Имя аудитории.
+            audience_ids (iterable): Найденные ID аудитории.
+            owner (str): Владелец резерва; по умолчанию - текущий процесс.
+            ttl (float): Срок резерва в секундах.
+
+        Returns:
+            list: Новые ID, зарезервированные за вызывающим, или None при ошибке записи.
+        """
+        owner = owner or str(os.getpid())
+        expires = time.time() + ttl
+        added = []
+        try:
+            with self.conn:
+                for audience_id in dict.fromkeys(audience_ids):
+                    c = self.conn.execute("INSERT OR IGNORE INTO audience_ids (audience_name, audience_id, claim_owner, claim_expires) "
+                                          "VALUES (?, ?, ?, ?)", (audience_name, audience_id, owner, expires))
+                    if c.rowcount:
+                        added.append(audience_id)
+            return added
+        except sqlite3.Error as e:
+            print(f"Ошибка при добавлении ID аудитории: {e}")
+            return None
+
+    def get_audience_ids(self, audience_name: str) -> list:
+        """
+        Получает список всех ID аудитории.
+
+        Args:
+            audience_name (str): Имя аудитории.
+
+        Returns:
+            list: Список ID аудитории.
+        """
+        try:
+            c = self.conn.cursor()
+            c.execute("SELECT audience_id FROM audience_ids WHERE audience_name = ? ORDER BY id", (audience_name,))
+            rows = c.fetchall()
+            audience_ids = [row[0] for row in rows]
+            print(f"Список ID аудитории '{audience_name}' получен.")
+            return audience_ids
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении списка ID аудитории: {e}")
+            return []
+
+    def count_audience_ids(self, audience_name: str, unused_only: bool = False) -> int:
+        """
+        Возвращает количество ID в аудитории.
+
+        Args:
+            audience_name (str): Имя аудитории.
+            unused_only (bool): Считать только неиспользованные ID.
+        """
+        query = "SELECT COUNT(*) FROM audience_ids WHERE audience_name = ?"
+        if unused_only:
+            query += " AND used = 0"
+        try:
+            return self.conn.execute(query, (audience_name,)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете ID аудитории: {e}")
+            return 0
+
+    def get_unused_audience_ids(self, audience_name: str, limit: int = 1000) -> list:
+        """
+        Получает неиспользованные ID аудитории (не более limit).
+
+        Args:
+            audience_name (str): Имя аудитории.
+            limit (int): Максимальное количество ID.
+        """
+        try:
+            c = self.conn.execute("SELECT audience_id FROM audience_ids WHERE audience_name = ? AND used = 0 ORDER BY id LIMIT ?", (audience_name, limit))
+            return [row[0] for row in c.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении ID аудитории: {e}")
+            return []
+
+    def mark_audience_id_as_used(self, audience_name: str, audience_id) -> None:
+        self.mark_audience_ids_used(audience_name, [audience_id])
+
+    def mark_audience_ids_used(self, audience_name: str, audience_ids) -> bool:
+        """
+        Помечает пачку отправленных ID аудитории как использованные (и снимает резерв) одной транзакцией.
+
+        Returns:
+            bool: False, если записать не удалось.
+        """
+        try:
+            with self.conn:
+                self.conn.executemany("UPDATE audience_ids SET used = 1, claim_owner = NULL, claim_expires = NULL "
+                                      "WHERE audience_name = ? AND audience_id = ?",
+                                      ((audience_name, audience_id) for audience_id in audience_ids))
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении ID аудитории: {e}")
+            return False
+
+    def claim_audience_ids(self, audience_name: str, count: int = 1, owner: str = None,
+                           ttl: float = DEFAULT_AUDIENCE_CLAIM_TTL) -> list:
+        """
+        Атомарно резервирует следующую пачку неиспользованных ID аудитории.
+
+        Выборка идет по частичному индексу, поэтому стоимость не зависит
+        от размера аудитории. Зарезервированный ID другой поток получить уже
+        не может; used = 1 ставится только после отправки
+        (mark_audience_ids_used). Резерв, который владелец не продлил
+        (renew_audience_claims) и не снял за ttl секунд (процесс упал),
+        истекает, и ID снова выдается.
+
+        Args:
+            audience_name (str): Имя аудитории.
+            count (int): Сколько ID зарезервировать.
+            owner (str): Владелец резерва; по умолчанию - текущий процесс.
+            ttl (float): Срок резерва в секундах.
+
+        Returns:
+            list: Список зарезервированных ID аудитории.
+        """
+        owner = owner or str(os.getpid())
+        now = time.time()
+        free = "audience_name = ? AND used = 0 AND (claim_owner IS NULL OR claim_expires < ?)"
+        conn = self.conn
+        try:
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                with conn:
+                    rows = conn.execute(f"""
+                        UPDATE audience_ids SET claim_owner = ?, claim_expires = ?
+                        WHERE id IN (SELECT id FROM audience_ids WHERE {free} ORDER BY id LIMIT ?)
+                        RETURNING audience_id
+                    """, (owner, now + ttl, audience_name, now, count)).fetchall()
+            else:
+                # RETURNING недоступен: резервируем под блокировкой на запись
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = conn.execute(f"SELECT id, audience_id FROM audience_ids WHERE {free} ORDER BY id LIMIT ?",
+                                        (audience_name, now, count)).fetchall()
+                    conn.executemany("UPDATE audience_ids SET claim_owner = ?, claim_expires = ? WHERE id = ?",
+                                     [(owner, now + ttl, row[0]) for row in rows])
+                    conn.commit()
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+                rows = [(row[1],) for row in rows]
+            return [row[0] for row in rows]
+        except sqlite3.Error as e:
+            print(f"Ошибка при резервировании ID аудитории: {e}")
+            return []
+
+    def renew_audience_claims(self, owner: str, ttl: float = DEFAULT_AUDIENCE_CLAIM_TTL) -> None:
+        """
+        Продлевает все неотправленные резервы ID аудитории владельца.
+        """
+        try:
+            with self.conn:
+                self.conn.execute("UPDATE audience_ids SET claim_expires = ? WHERE claim_owner = ? AND used = 0",
+                                  (time.time() + ttl, owner))
+        except sqlite3.Error as e:
+            print(f"Ошибка при продлении резерва ID аудитории: {e}")
+
+    def release_audience_ids(self, audience_name: str, audience_ids: list) -> None:
+        """
+        Снимает резерв с зарезервированных, но не отправленных ID аудитории.
+
+        Args:
+            audience_name (str): Имя аудитории.
+            audience_ids (list): Список ID аудитории.
+        """
+        if not audience_ids:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany("UPDATE audience_ids SET claim_owner = NULL, claim_expires = NULL "
+                                      "WHERE audience_name = ? AND audience_id = ? AND used = 0",
+                                      [(audience_name, audience_id) for audience_id in audience_ids])
+        except sqlite3.Error as e:
+            print(f"Ошибка при возврате ID аудитории: {e}")
+
+    def load_spintax_state(self, template_hash: str, seed: int) -> tuple:
+        """
+        Возвращает сохраненные зерно и позицию спинтакса; для нового шаблона сохраняет seed.
+
+        Args:
+            template_hash (str): Хэш шаблона (template_hash).
+            seed (int): Зерно, если шаблон встречается впервые.
+
+        Returns:
+            tuple: (зерно, позиция) или None при ошибке.
+        """
+        try:
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO spintax_state (template_hash, seed, position) VALUES (?, ?, 0)",
+                                  (template_hash, seed))
+                row = self.conn.execute("SELECT seed, position FROM spintax_state WHERE template_hash = ?",
+                                        (template_hash,)).fetchone()
+            return row[0], row[1]
+        except sqlite3.Error as e:
+            print(f"Ошибка при загрузке состояния спинтакса: {e}")
+            return None
+
+    def advance_spintax_state(self, template_hash: str, position: int) -> None:
+        """
+        Сдвигает сохраненную позицию спинтакса вперед (назад она не уходит).
+        """
+        try:
+            with self.conn:
+                self.conn.execute("UPDATE spintax_state SET position = MAX(position, ?) WHERE template_hash = ?",
+                                  (position, template_hash))
+        except sqlite3.Error as e:
+            print(f"Ошибка при сохранении состояния спинтакса: {e}")
+
+    def create_parsed_audience_table(self) -> None:
+        self.migrate()
+
+
+def ensure_parsed_audience_table_exists(db_file: str):
+    db_manager = DatabaseManager(db_file)
+    try:
+        db_manager.migrate()
+    finally:
+        db_manager.close()
@@ -0,0 +1,440 @@
+"""
+Выполнение заданий в пуле потоков, сводные результаты и счетчики прогресса.
+"""
+import atexit
+import queue
+import threading
+import time
+
+from .db import DEFAULT_AUDIENCE_CLAIM_TTL, DatabaseManager
+from .net import CircuitOpenError
+
+
+class TaskResult:
+    """
+    Сводные результаты задачи по аккаунтам (потокобезопасно).
+    """
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.errors = {}
+        self.skipped = []  # id аккаунтов, отложенных без траты попытки (JobDeferred, CircuitOpenError)
+        self.postponed = []  # id аккаунтов, отложенных до следующего запуска (JobDeferred(retry=False))
+        self._lock = threading.Lock()
+
+    def add(self, account: dict, value) -> int:
+        with self._lock:
+            self.processed += 1
+            if value:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            return self.processed
+
+    def skip(self, account: dict) -> None:
+        with self._lock:
+            self.skipped.append(account.get('id'))
+
+    def postpone(self, account: dict) -> None:
+        with self._lock:
+            self.postponed.append(account.get('id'))
+
+    def add_error(self, account: dict, error: Exception) -> int:
+        with self._lock:
+            self.processed += 1
+            self.failed += 1
+            self.errors[account.get('id')] = str(error) or type(error).__name__
+            return self.processed
+
+
+class JobDeferred(Exception):
+    """
+    Задание нельзя выполнить сейчас: TaskEngine откладывает его, и попытка не засчитывается.
+
+    С retry=True задание повторяется в этом же запуске (TaskResult.skip), с
+    retry=False - только в следующем (TaskResult.postpone), например когда
+    исчерпана дневная квота аккаунта.
+    """
+
+    def __init__(self, message: str = '', retry: bool = True):
+        super().__init__(message)
+        self.retry = retry
+
+
+class SharedCounters:
+    """
+    Блок счетчиков задачи в разделяемой памяти (multiprocessing.shared_memory).
+
+    У каждого рабочего процесса своя строка счетчиков (slot), поэтому между
+    процессами блокировки не нужны; потоки одного процесса увеличивают
+    свою строку под дешевой локальной блокировкой. Читатель суммирует строки.
+    """
+
+    FIELDS = ('processed', 'succeeded', 'failed', 'sent')
+
+    def __init__(self, slots: int, name: str = None):
+        """
+        Args:
+            slots (int): Число строк счетчиков (по одной на процесс).
+            name (str): Имя существующего блока; если не задано, создается новый.
+        """
+        from multiprocessing import shared_memory
+        self.slots = slots
+        size = max(1, slots) * len(self.FIELDS) * 8
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.memory.buf[:size] = bytes(size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.values = self.memory.buf[:size].cast('q')
+        self._lock = threading.Lock()
+
+    def increment(self, slot: int, field: str, amount: int = 1) -> None:
+        position = slot * len(self.FIELDS) + self.FIELDS.index(field)
+        with self._lock:
+            self.values[position] += amount
+
+    def totals(self) -> dict:
+        """
+        Возвращает суммы счетчиков по всем процессам (None, если блок уже закрыт).
+        """
+        width = len(self.FIELDS)
+        with self._lock:
+            if self.values is None:
+                return None
+            values = self.values.tolist()
+        return {field: sum(values[index::width]) for index, field in enumerate(self.FIELDS)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self.values is not None:
+                self.values.release()
+                self.values = None
+                self.memory.close()
+
+    def unlink(self) -> None:
+        """
+        Закрывает и удаляет блок; вызывается создателем после завершения задачи.
+        """
+        self.close()
+        try:
+            self.memory.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class AudienceWriter:
+    """
+    Фоновая запись ID аудитории задачи.
+
+    Найденные ID (add_parsed) добавляются в аудиторию пачками через
+    INSERT OR IGNORE сразу зарезервированными за owner; новые для аудитории
+    ID передаются в on_new из потока записи. Отправленные ID (add_sent)
+    помечаются used = 1 пачками. Поток записи продлевает резервы владельца
+    раз в ttl / 3, поэтому после сбоя резервы истекают, и найденные, но не
+    отправленные ID остаются в аудитории неиспользованными. Пачки, которые
+    не удалось записать, повторяются при следующей записи.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, audience_name: str, owner: str, ttl: float = DEFAULT_AUDIENCE_CLAIM_TTL,
+                 on_new=None, batch_size: int = 500, interval: float = 0.2):
+        self.db_manager = db_manager
+        self.audience_name = audience_name
+        self.owner = owner
+        self.ttl = ttl
+        self.on_new = on_new
+        self.batch_size = batch_size
+        self.interval = interval
+        self._parsed = []
+        self._sent = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._renewed = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add_parsed(self, audience_ids: list) -> None:
+        with self._lock:
+            self._parsed.extend(audience_ids)
+            if len(self._parsed) >= self.batch_size:
+                self._wake.set()
+
+    def add_sent(self, audience_id) -> None:
+        with self._lock:
+            self._sent.append(audience_id)
+            if len(self._sent) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self) -> None:
+        """
+        Записывает накопленные ID; новые найденные ID передаются в on_new до возврата.
+        """
+        with self._write_lock:
+            with self._lock:
+                parsed, self._parsed = self._parsed, []
+                sent, self._sent = self._sent, []
+            if parsed:
+                new_ids = self.db_manager.claim_new_audience_ids(self.audience_name, parsed, self.owner, self.ttl)
+                if new_ids is None:
+                    with self._lock:
+                        self._parsed[:0] = parsed
+                elif new_ids and self.on_new:
+                    self.on_new(new_ids)
+            if sent and not self.db_manager.mark_audience_ids_used(self.audience_name, sent):
+                with self._lock:
+                    self._sent[:0] = sent
+            if time.monotonic() - self._renewed > self.ttl / 3:
+                self.db_manager.renew_audience_claims(self.owner, self.ttl)
+                self._renewed = time.monotonic()
+
+    def _run(self) -> None:
+        try:
+            while not self._closed:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                self.flush()
+        finally:
+            self.db_manager.release()
+
+    def close(self) -> None:
+        """
+        Останавливает поток и дописывает все накопленные ID.
+        """
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        if self._parsed or self._sent:
+            print(f"ID аудитории не записаны: найденных {len(self._parsed)}, отправленных {len(self._sent)}.")
+
+
+class AccountWriteError(Exception):
+    """
+    Изменения аккаунтов не удалось записать в базу (AccountWriter.flush).
+    """
+
+
+class AccountWriter:
+    """
+    Фоновая запись статусов и счетчиков сообщений аккаунтов (write-behind).
+
+    Рабочие потоки кладут изменения в очередь и не ждут базу. Единственный
+    поток записи объединяет изменения одного аккаунта (последний статус,
+    сумма сообщений) и записывает их одной транзакцией на таблицу, когда
+    накопилось batch_size аккаунтов или прошло interval секунд с первого
+    незаписанного изменения. Новые значения счетчиков сообщений передаются
+    в on_account_update после записи.
+
+    Изменения, которые не удалось записать (ошибка базы), остаются в очереди
+    и повторяются через interval секунд, объединяясь с новыми.
+
+    flush() возвращается, когда записано все, что было поставлено до вызова,
+    и сообщает False, если часть изменений не записана и после retries
+    повторов; close() (и выход из интерпретатора) останавливает поток и
+    дописывает остаток.
+    """
+
+    _FLUSH = 'flush'
+    _STOP = 'stop'
+
+    def __init__(self, db_manager: DatabaseManager, batch_size: int = 500, interval: float = 0.5, retries: int = 3):
+        self.db_manager = db_manager
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.retries = retries
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def set_status(self, table_name: str, account_id: int, status: str) -> None:
+        self._queue.put((table_name, account_id, status, 0, None))
+
+    def add_messages(self, table_name: str, account_id: int, count: int = 1, on_account_update=None) -> None:
+        """
+        Добавляет сообщения к счетчикам аккаунта; on_account_update(account_id, counters)
+        вызывается из потока записи с новыми значениями счетчиков.
+        """
+        self._queue.put((table_name, account_id, None, count, on_account_update))
+
+    def flush(self) -> bool:
+        """
+        Дожидается записи всех изменений, поставленных до вызова.
+
+        Returns:
+            bool: False, если часть изменений не записана (они остаются в очереди на повтор).
+        """
+        done = threading.Event()
+        written = [False]
+        self._queue.put((self._FLUSH, done, written))
+        while not done.wait(0.5):
+            if not self._thread.is_alive():
+                return False
+        return written[0]
+
+    def close(self) -> None:
+        """
+        Останавливает поток записи, дописав все накопленные изменения.
+        """
+        atexit.unregister(self.close)
+        if self._thread.is_alive():
+            self._queue.put((self._STOP,))
+            self._thread.join()
+
+    def _run(self) -> None:
+        pending = {}
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is None or item[0] in (self._FLUSH, self._STOP):
+                    pending = self._write(pending)
+                    # По flush и stop запись повторяется сразу, иначе - по таймеру вместе с новыми изменениями
+                    for _ in range(self.retries if item is not None else 0):
+                        if not pending:
+                            break
+                        time.sleep(self.interval)
+                        pending = self._write(pending)
+                    deadline = time.monotonic() + self.interval if pending else None
+                    if item is None:
+                        continue
+                    if item[0] == self._FLUSH:
+                        item[2][0] = not pending
+                        item[1].set()
+                        continue
+                    if item[0] == self._STOP:
+                        if pending:
+                            print(f"Изменения аккаунтов не записаны: {len(pending)}.")
+                        break
+                table_name, account_id, status, count, callback = item
+                entry = pending.get((table_name, account_id))
+                if entry is None:
+                    entry = pending[(table_name, account_id)] = [None, 0, None]
+                    if deadline is None:
+                        deadline = time.monotonic() + self.interval
+                if status is not None:
+                    entry[0] = status
+                entry[1] += count
+                if callback is not None:
+                    entry[2] = callback
+                if len(pending) >= self.batch_size:
+                    pending = self._write(pending)
+                    deadline = time.monotonic() + self.interval if pending else None
+        finally:
+            self.db_manager.release()
+
+    def _write(self, pending: dict) -> dict:
+        """
+        Записывает изменения по таблицам и возвращает те, что записать не удалось.
+        """
+        tables = {}
+        failed = {}
+        for (table_name, account_id), entry in pending.items():
+            tables.setdefault(table_name, {})[account_id] = entry
+        for table_name, entries in tables.items():
+            statuses = {account_id: entry[0] for account_id, entry in entries.items() if entry[0] is not None}
+            messages = {account_id: entry[1] for account_id, entry in entries.items() if entry[1]}
+            counters = self.db_manager.apply_account_updates(table_name, statuses, messages)
+            if counters is None:
+                failed.update(((table_name, account_id), entry) for account_id, entry in entries.items())
+                continue
+            for account_id, values in counters.items():
+                callback = entries[account_id][2]
+                if callback is not None:
+                    callback(account_id, values)
+        return failed
+
+
+class TaskEngine:
+    """
+    Пул рабочих потоков с ограниченной очередью заданий.
+
+    Производитель блокируется, когда очередь заполнена, поэтому в памяти
+    одновременно находится не больше queue_size ожидающих аккаунтов.
+    """
+
+    _STOP = object()
+
+    def __init__(self, workers: int, queue_size: int = None):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or self.workers * 4
+
+    def run(self, items: list, handler, on_result=None, stop_event: threading.Event = None, cleanup=None) -> TaskResult:
+        """
+        Обрабатывает элементы в нескольких потоках.
+
+        Args:
+            items (list): Элементы (аккаунты) для обработки.
+            handler (callable): handler(item, state) -> значение; state - словарь потока.
+            on_result (callable): Вызывается как on_result(item, value) после каждого элемента.
+            stop_event (threading.Event): Событие остановки.
+            cleanup (callable): Вызывается в каждом потоке при завершении как cleanup(state).
+
+        Returns:
+            TaskResult: Сводные результаты.
+        """
+        result = TaskResult(len(items))
+        tasks = queue.Queue(maxsize=self.queue_size)
+        stop_event = stop_event or threading.Event()
+
+        def worker():
+            state = {}
+            try:
+                while True:
+                    item = tasks.get()
+                    if item is self._STOP:
+                        break
+                    if stop_event.is_set():
+                        continue
+                    try:
+                        value = handler(item, state)
+                        result.add(item, value)
+                    except CircuitOpenError:
+                        # Цель временно недоступна: задание откладывается, поток берет следующее
+                        result.skip(item)
+                        continue
+                    except JobDeferred as e:
+                        if e.retry:
+                            result.skip(item)
+                        else:
+                            result.postpone(item)
+                        continue
+                    except Exception as e:
+                        print(f"Ошибка при обработке аккаунта: {e}")
+                        result.add_error(item, e)
+                        value = None
+                    if on_result:
+                        # Ошибка в обработчике результата не должна останавливать поток:
+                        # иначе производитель заблокируется на заполненной очереди
+                        try:
+                            on_result(item, value)
+                        except Exception as e:
+                            print(f"Ошибка при обработке результата аккаунта: {e}")
+            finally:
+                if cleanup:
+                    cleanup(state)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(self.workers, max(1, len(items))))]
+        for thread in threads:
+            thread.start()
+        try:
+            for item in items:
+                if stop_event.is_set():
+                    break
+                tasks.put(item)
+        finally:
+            for _ in threads:
+                tasks.put(self._STOP)
+            for thread in threads:
+                thread.join()
+        return result
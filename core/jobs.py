@@ -0,0 +1,331 @@
+"""
+Очередь заданий в SQLite и аренда аккаунтов задачами.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from .db import DatabaseManager
+
+
+def new_owner() -> str:
+    """
+    Уникальный идентификатор владельца задачи или аренды: pid процесса и случайная часть.
+    """
+    return f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+class JobQueue:
+    """
+    Очередь заданий задачи в SQLite: одна строка на пару (задача, аккаунт).
+
+    У каждого задания есть состояние (pending/running/done/failed), число
+    попыток и последняя ошибка. Рабочие берут задания пачками, результаты
+    фиксируются после каждой пачки, поэтому после сбоя или остановки
+    задача продолжается с места остановки, а выполненные задания не
+    повторяются.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_attempts: int = 3):
+        self.db_manager = db_manager
+        self.max_attempts = max_attempts
+
+    def create_task(self, task_type: str, table_name: str, audience_name: str, account_ids: list, account_status: str = None,
+                    owner: str = None) -> int:
+        """
+        Создает задачу и ставит в очередь задания для всех аккаунтов.
+
+        Задача без владельца попадает в очередь демона ('pending'). Задача,
+        которую создатель выполняет сам, создается сразу захваченной
+        (owner), чтобы демон не успел взять ее раньше.
+
+        Args:
+            account_status (str): Статус, по которому отобраны аккаунты (если отбирались).
+            owner (str): Владелец, который сразу выполняет задачу (TaskLease.owner).
+
+        Returns:
+            int: id задачи.
+        """
+        conn = self.db_manager.conn
+        with conn:
+            c = conn.execute("INSERT INTO tasks (task_type, table_name, audience_name, account_status, state, owner, heartbeat, updated_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))",
+                             (task_type, table_name, audience_name, account_status, 'running' if owner else 'pending', owner,
+                              time.time() if owner else None))
+            task_id = c.lastrowid
+            conn.executemany("INSERT OR IGNORE INTO task_jobs (task_id, account_id) VALUES (?, ?)",
+                             ((task_id, account_id) for account_id in account_ids))
+        print(f"Задача #{task_id} '{task_type}' создана: заданий {len(account_ids)}.")
+        return task_id
+
+    def get_task(self, task_id: int) -> dict:
+        c = self.db_manager.conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
+        row = c.fetchone()
+        return dict(zip([column[0] for column in c.description], row)) if row else None
+
+    def find_unfinished(self, task_type: str = None, table_name: str = None, audience_name: str = None,
+                        account_status: str = None, ttl: float = None) -> list:
+        """
+        Возвращает id задач, которые можно продолжить (по типу, таблице и аудитории, если указаны).
+
+        Подходят остановленные задачи и задачи 'running', владелец которых
+        не отмечался дольше ttl секунд (процесс завершился аварийно). Задачи
+        в очереди демона ('pending') и выполняющиеся сейчас не возвращаются.
+        Отбор аккаунтов по статусу должен совпадать (account_status).
+        """
+        ttl = DEFAULT_TASK_TTL if ttl is None else ttl
+        query = ("SELECT id FROM tasks WHERE (state = 'stopped' OR (state = 'running' AND (heartbeat IS NULL OR heartbeat < ?)))"
+                 " AND account_status IS ?")
+        params = [time.time() - ttl, account_status]
+        if task_type is not None:
+            query += " AND task_type = ?"
+            params.append(task_type)
+        if table_name is not None:
+            query += " AND table_name = ?"
+            params.append(table_name)
+        if audience_name is not None:
+            query += " AND audience_name = ?"
+            params.append(audience_name)
+        return [row[0] for row in self.db_manager.conn.execute(query + " ORDER BY id", params)]
+
+    def claim_task(self, owner: str, ttl: float = None):
+        """
+        Атомарно берет в работу самую старую задачу в состоянии 'pending'
+        или задачу 'running', владелец которой не отмечался дольше ttl секунд.
+
+        Args:
+            owner (str): Идентификатор владельца (TaskLease.owner).
+
+        Returns:
+            int: id задачи или None, если очередь пуста.
+        """
+        ttl = DEFAULT_TASK_TTL if ttl is None else ttl
+        now = time.time()
+        conn = self.db_manager.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id FROM tasks WHERE state = 'pending' OR (state = 'running' AND (heartbeat IS NULL OR heartbeat < ?)) "
+                               "ORDER BY id LIMIT 1", (now - ttl,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE tasks SET state = 'running', owner = ?, heartbeat = ?, updated_at = datetime('now') WHERE id = ?",
+                             (owner, now, row[0]))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return row[0] if row else None
+
+    def acquire_task(self, task_id: int, owner: str, ttl: float = None) -> bool:
+        """
+        Атомарно становится владельцем задачи, если у нее нет живого владельца.
+
+        Returns:
+            bool: True, если задача теперь принадлежит owner.
+        """
+        ttl = DEFAULT_TASK_TTL if ttl is None else ttl
+        now = time.time()
+        with self.db_manager.conn:
+            c = self.db_manager.conn.execute("""
+                UPDATE tasks SET state = 'running', owner = ?, heartbeat = ?, updated_at = datetime('now')
+                WHERE id = ? AND (owner IS NULL OR owner = ? OR heartbeat IS NULL OR heartbeat < ?)
+            """, (owner, now, task_id, owner, now - ttl))
+        return c.rowcount == 1
+
+    def renew_task(self, task_id: int, owner: str) -> bool:
+        """
+        Обновляет отметку активности владельца задачи.
+        """
+        with self.db_manager.conn:
+            c = self.db_manager.conn.execute("UPDATE tasks SET heartbeat = ? WHERE id = ? AND owner = ?", (time.time(), task_id, owner))
+        return c.rowcount == 1
+
+    def release_task(self, task_id: int, owner: str, state: str) -> None:
+        """
+        Снимает владельца задачи и записывает ее итоговое состояние.
+        """
+        with self.db_manager.conn:
+            self.db_manager.conn.execute("UPDATE tasks SET state = ?, owner = NULL, heartbeat = NULL, updated_at = datetime('now') "
+                                         "WHERE id = ? AND owner = ?", (state, task_id, owner))
+
+    def list_tasks(self, limit: int = 20) -> list:
+        """
+        Возвращает последние задачи со счетчиками заданий по состояниям.
+        """
+        c = self.db_manager.conn.execute("SELECT * FROM tasks ORDER BY id DESC LIMIT ?", (limit,))
+        columns = [column[0] for column in c.description]
+        tasks = [dict(zip(columns, row)) for row in c.fetchall()]
+        for task in tasks:
+            task['jobs'] = self.counts(task['id'])
+        return tasks
+
+    def set_task_state(self, task_id: int, state: str) -> None:
+        """
+        Меняет состояние задачи, у которой нет владельца (задачу, захваченную
+        через TaskLease, меняет только ее владелец).
+        """
+        with self.db_manager.conn:
+            self.db_manager.conn.execute("UPDATE tasks SET state = ?, updated_at = datetime('now') WHERE id = ? AND owner IS NULL",
+                                         (state, task_id))
+
+    def recover(self, task_id: int) -> int:
+        """
+        Возвращает в очередь задания, взятые в работу, но не завершенные (после сбоя или остановки).
+        """
+        with self.db_manager.conn:
+            c = self.db_manager.conn.execute("UPDATE task_jobs SET state = 'pending' WHERE task_id = ? AND state = 'running'", (task_id,))
+        return c.rowcount
+
+    def dequeue(self, task_id: int, count: int) -> list:
+        """
+        Атомарно берет в работу следующую пачку заданий.
+
+        Returns:
+            list: id аккаунтов.
+        """
+        conn = self.db_manager.conn
+        # Очередь одной задачи могут разбирать несколько процессов: выборка и
+        # пометка заданий выполняются под одной блокировкой записи
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [row[0] for row in conn.execute("SELECT id FROM task_jobs WHERE task_id = ? AND state = 'pending' ORDER BY id LIMIT ?", (task_id, count))]
+            account_ids = []
+            if ids:
+                placeholders = ', '.join('?' * len(ids))
+                conn.execute(f"UPDATE task_jobs SET state = 'running', attempts = attempts + 1, updated_at = datetime('now') WHERE id IN ({placeholders})", ids)
+                account_ids = [row[0] for row in conn.execute(f"SELECT account_id FROM task_jobs WHERE id IN ({placeholders}) ORDER BY id", ids)]
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return account_ids
+
+    def checkpoint(self, task_id: int, outcomes: list) -> None:
+        """
+        Фиксирует результаты пачки одной транзакцией.
+
+        Неудачные задания возвращаются в очередь, пока не исчерпан лимит попыток.
+
+        Args:
+            outcomes (list): Кортежи (account_id, ok, error).
+        """
+        if not outcomes:
+            return
+        with self.db_manager.conn:
+            self.db_manager.conn.executemany("""
+                UPDATE task_jobs
+                SET state = CASE WHEN ? THEN 'done' WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    last_error = ?,
+                    updated_at = datetime('now')
+                WHERE task_id = ? AND account_id = ?
+            """, [(1 if ok else 0, self.max_attempts, error, task_id, account_id) for account_id, ok, error in outcomes])
+
+    def requeue(self, task_id: int, account_ids: list) -> None:
+        """
+        Возвращает в очередь взятые задания, которые не удалось выполнить сейчас
+        (например, аккаунт арендован другой задачей), не засчитывая попытку.
+        """
+        with self.db_manager.conn:
+            self.db_manager.conn.executemany("UPDATE task_jobs SET state = 'pending', attempts = attempts - 1, updated_at = datetime('now') "
+                                             "WHERE task_id = ? AND account_id = ? AND state = 'running'",
+                                             [(task_id, account_id) for account_id in account_ids])
+
+    def counts(self, task_id: int) -> dict:
+        """
+        Возвращает количество заданий задачи по состояниям.
+        """
+        return dict(self.db_manager.conn.execute("SELECT state, COUNT(*) FROM task_jobs WHERE task_id = ? GROUP BY state", (task_id,)).fetchall())
+
+
+DEFAULT_LEASE_TTL = 300.0
+
+# Через сколько секунд без отметки владельца задача считается брошенной
+DEFAULT_TASK_TTL = 60.0
+
+
+class TaskLease:
+    """
+    Владение задачей из очереди: захват, фоновая отметка активности и освобождение.
+
+    Пока владение открыто (with), поток обновляет heartbeat задачи каждые
+    ttl / 3 секунд. Задачу, владелец которой не отмечался дольше ttl
+    (процесс убит или упал), может забрать другой процесс.
+    """
+
+    def __init__(self, job_queue: JobQueue, task_id: int, ttl: float = DEFAULT_TASK_TTL, owner: str = None):
+        self.job_queue = job_queue
+        self.task_id = task_id
+        self.ttl = ttl
+        self.owner = owner or new_owner()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self) -> bool:
+        return self.job_queue.acquire_task(self.task_id, self.owner, self.ttl)
+
+    def release(self, state: str) -> None:
+        self.job_queue.release_task(self.task_id, self.owner, state)
+
+    def _keep_alive(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            self.job_queue.renew_task(self.task_id, self.owner)
+        self.job_queue.db_manager.release()
+
+    def __enter__(self) -> 'TaskLease':
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._keep_alive, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class AccountLease:
+    """
+    Аренда аккаунтов задачей: захват, фоновое продление и освобождение.
+
+    Пока аренда открыта (with), поток продлевает ее каждые ttl / 3 секунд.
+    Если процесс завершился аварийно, аренда истекает сама через ttl.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, table_name: str, ttl: float = DEFAULT_LEASE_TTL, owner: str = None):
+        self.db_manager = db_manager
+        self.table_name = table_name
+        self.ttl = ttl
+        self.owner = owner or new_owner()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self, account_ids: list = None, limit: int = None) -> list:
+        """
+        Арендует указанные аккаунты (или limit любых свободных).
+
+        Returns:
+            list: id аккаунтов, которые удалось арендовать.
+        """
+        return self.db_manager.lease_accounts(self.table_name, self.owner, self.ttl, account_ids, limit)
+
+    def renew(self) -> int:
+        return self.db_manager.renew_account_leases(self.table_name, self.owner, self.ttl)
+
+    def release(self, account_ids: list = None) -> None:
+        self.db_manager.release_account_leases(self.table_name, self.owner, account_ids)
+
+    def _keep_alive(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            self.renew()
+        self.db_manager.release()
+
+    def __enter__(self) -> 'AccountLease':
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._keep_alive, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.release()
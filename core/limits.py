@@ -0,0 +1,167 @@
+"""
+Ограничение частоты: token bucket, ограничитель рассылки и троттлинг сигналов.
+"""
+import threading
+import time
+
+
+# Ограничения рассылки по умолчанию: сообщений в секунду всего и на аккаунт, сообщений в день на аккаунт
+DEFAULT_SEND_RATE_GLOBAL = 5.0
+DEFAULT_SEND_RATE_ACCOUNT = 0.1
+DEFAULT_DAILY_LIMIT = 50
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity про запас.
+
+    Токены резервируются на момент в будущем, поэтому ожидающие потоки
+    выстраиваются в очередь без всплесков.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, at: float) -> None:
+        if at > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (at - self.updated) * self.rate)
+            self.updated = at
+
+    def available_at(self, now: float) -> float:
+        """
+        Возвращает ближайший момент, когда в корзине будет токен.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return max(now, self.updated)
+        return self.updated + (1 - self.tokens) / self.rate
+
+    def consume(self, at: float) -> None:
+        self._refill(at)
+        self.tokens -= 1
+
+    def refund(self) -> None:
+        """
+        Возвращает токен, взятый consume, если отправка не состоялась.
+        """
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class RateLimiter:
+    """
+    Ограничение отправки сообщений: общая корзина, корзина на аккаунт и дневная квота.
+
+    acquire() резервирует токен сразу в обеих корзинах на ближайший
+    момент, когда они оба доступны, и ждет ровно до этого момента.
+    Дневная квота считается от колонки messages_day аккаунта. Если
+    сообщение так и не отправлено, refund() возвращает токены и квоту.
+    """
+
+    def __init__(self, global_rate: float, account_rate: float, daily_limit: int = 0, burst: float = 1.0):
+        self.global_bucket = TokenBucket(global_rate, burst)
+        self.account_rate = account_rate
+        self.daily_limit = daily_limit
+        self.burst = burst
+        self._account_buckets = {}
+        self._sent_today = {}
+        self._day = time.strftime('%Y-%m-%d')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> 'RateLimiter':
+        return cls(
+            global_rate=float(settings.get('send_rate_global') or DEFAULT_SEND_RATE_GLOBAL),
+            account_rate=float(settings.get('send_rate_account') or DEFAULT_SEND_RATE_ACCOUNT),
+            daily_limit=int(settings.get('daily_limit') or DEFAULT_DAILY_LIMIT),
+        )
+
+    def load_accounts(self, accounts: list) -> None:
+        """
+        Учитывает уже отправленные сегодня сообщения (messages_day) для дневной квоты.
+        """
+        today = time.strftime('%Y-%m-%d')
+        with self._lock:
+            self._roll_day()
+            for account in accounts:
+                sent = (account.get('messages_day') or 0) if account.get('messages_date') == today else 0
+                self._sent_today[account['id']] = max(self._sent_today.get(account['id'], 0), sent)
+
+    def _roll_day(self) -> None:
+        today = time.strftime('%Y-%m-%d')
+        if today != self._day:
+            self._day = today
+            self._sent_today.clear()
+
+    def quota_exhausted(self, account: dict) -> bool:
+        """
+        Проверяет, исчерпана ли дневная квота аккаунта.
+        """
+        with self._lock:
+            self._roll_day()
+            return bool(self.daily_limit) and self._sent_today.get(account['id'], 0) >= self.daily_limit
+
+    def acquire(self, account: dict, stop_event: threading.Event = None) -> bool:
+        """
+        Ждет разрешения на отправку сообщения от аккаунта.
+
+        Если задача остановлена во время ожидания, резерв возвращается (refund).
+
+        Returns:
+            bool: False, если дневная квота аккаунта исчерпана (quota_exhausted) или задача остановлена.
+        """
+        account_id = account['id']
+        with self._lock:
+            self._roll_day()
+            if self.daily_limit and self._sent_today.get(account_id, 0) >= self.daily_limit:
+                return False
+            bucket = self._account_buckets.get(account_id)
+            if bucket is None:
+                bucket = self._account_buckets[account_id] = TokenBucket(self.account_rate, self.burst)
+            now = time.monotonic()
+            at = max(self.global_bucket.available_at(now), bucket.available_at(now))
+            self.global_bucket.consume(at)
+            bucket.consume(at)
+            self._sent_today[account_id] = self._sent_today.get(account_id, 0) + 1
+        delay = at - time.monotonic()
+        if delay > 0:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    self.refund(account)
+                    return False
+                return True
+            time.sleep(delay)
+        return True
+
+    def refund(self, account: dict) -> None:
+        """
+        Возвращает токены обеих корзин и место в дневной квоте, взятые acquire,
+        если сообщение не было отправлено.
+        """
+        account_id = account['id']
+        with self._lock:
+            self.global_bucket.refund()
+            bucket = self._account_buckets.get(account_id)
+            if bucket is not None:
+                bucket.refund()
+            if self._sent_today.get(account_id):
+                self._sent_today[account_id] -= 1
+
+
+class RateThrottle:
+    """
+    Ограничивает частоту событий: ready() возвращает True не чаще max_rate раз в секунду.
+    """
+
+    def __init__(self, max_rate: float):
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self._last = 0.0
+
+    def ready(self) -> bool:
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
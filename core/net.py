@@ -0,0 +1,358 @@
+"""
+Сеть: сессии аккаунтов, пул прокси, повторы запросов и предохранители.
+
+requests импортируется при первом обращении, чтобы не замедлять запуск.
+"""
+import random
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+
+def format_account_url(template: str, account: dict) -> str:
+    """
+    Подставляет поля аккаунта (в URL-кодировке) в шаблон адреса.
+    """
+    return template.format(**{key: urllib.parse.quote(str(value or ''), safe='') for key, value in account.items()})
+
+
+class SessionPool:
+    """
+    Пул HTTP-сессий requests с ключом (аккаунт, прокси).
+
+    Повторные запросы одного аккаунта через один прокси идут через уже
+    открытое keep-alive соединение. Сессии, не использовавшиеся дольше
+    idle_timeout, закрываются; при превышении max_size вытесняется самая
+    давно использованная. User-Agent и cookie берутся из колонок ua и
+    cookie аккаунта.
+    """
+
+    def __init__(self, max_size: int = 500, idle_timeout: float = 300.0):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, account: dict, proxy: str = None) -> 'requests.Session':
+        key = (account.get('id') or account.get('username'), proxy or None)
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+            # Сессии упорядочены по времени использования: устаревшие в начале
+            while self._sessions:
+                oldest_key, (oldest, last_used) = next(iter(self._sessions.items()))
+                if now - last_used < self.idle_timeout and len(self._sessions) < self.max_size:
+                    break
+                del self._sessions[oldest_key]
+                expired.append(oldest)
+            session = entry[0] if entry else self._create(account, proxy)
+            self._sessions[key] = (session, now)
+        for old in expired:
+            old.close()
+        return session
+
+    def _create(self, account: dict, proxy: str = None) -> 'requests.Session':
+        import requests
+        session = requests.Session()
+        session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        if account.get('ua'):
+            session.headers['User-Agent'] = account['ua']
+        for part in (account.get('cookie') or '').split(';'):
+            name, sep, value = part.strip().partition('=')
+            if sep and name:
+                session.cookies.set(name, value)
+        if proxy:
+            session.proxies = {'http': proxy, 'https': proxy}
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class CircuitOpenError(Exception):
+    """
+    Цель запроса (эндпоинт или прокси) временно отключена предохранителем;
+    задание нужно отложить, а не считать ошибкой.
+    """
+
+
+class RetryPolicy:
+    """
+    Повтор запросов с экспоненциальной задержкой и случайным разбросом (full jitter).
+
+    Повторяются только временные сбои: ошибки соединения, таймауты и
+    ответы 429/5xx.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 10.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_settings(cls, settings) -> 'RetryPolicy':
+        return cls(
+            attempts=int(settings.get('retry_attempts') or 3),
+            base_delay=float(settings.get('retry_base_delay') or 0.5),
+            max_delay=float(settings.get('retry_max_delay') or 10.0),
+        )
+
+    def delay(self, attempt: int) -> float:
+        """
+        Задержка перед повтором номер attempt (с 0).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_transient(self, error: Exception = None, response=None) -> bool:
+        if response is not None:
+            return response.status_code in self.RETRY_STATUSES
+        import requests
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для одной цели запросов (эндпоинта или прокси).
+
+    closed - запросы идут; после failure_threshold ошибок подряд переходит
+    в open - запросы отклоняются reset_timeout секунд; затем half_open -
+    пропускается один пробный запрос: успех замыкает цепь, ошибка снова
+    размыкает. Если пробный запрос не дошел до цели (release_probe) или не
+    завершился за reset_timeout секунд, пропускается следующий.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def available(self) -> bool:
+        """
+        Пропустит ли предохранитель запрос сейчас (не занимая пробный запрос).
+        """
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probe_busy())
+
+    def _probe_busy(self) -> bool:
+        # Пробный запрос, не завершившийся за reset_timeout, считается потерянным
+        return self._probe and time.monotonic() - self._probe_started < self.reset_timeout
+
+    def allow(self) -> bool:
+        """
+        Разрешает запрос; в half_open разрешает только один пробный запрос.
+        """
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_busy():
+                self._probe = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def release_probe(self) -> None:
+        """
+        Освобождает пробный запрос, не дошедший до цели (например, не нашлось
+        прокси), не меняя состояния предохранителя.
+        """
+        with self._lock:
+            self._probe = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe = False
+
+    def record_failure(self) -> bool:
+        """
+        Returns:
+            bool: True, если после этой ошибки предохранитель разомкнулся.
+        """
+        with self._lock:
+            self.failures += 1
+            if self._probe or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self._open()
+                return True
+            return False
+
+    def trip(self) -> None:
+        """
+        Принудительно размыкает цепь.
+        """
+        with self._lock:
+            self._open()
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self.failures = 0
+        self._probe = False
+
+
+class ProxyStats:
+    """
+    Статистика одного прокси: задержка, доля ошибок, текущая нагрузка и предохранитель.
+    """
+
+    def __init__(self, proxy: str, breaker: CircuitBreaker):
+        self.proxy = proxy
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.in_use = 0
+        self.breaker = breaker
+
+    def score(self) -> tuple:
+        # Прокси без замеров пробуются первыми, из них - наименее загруженные и
+        # ошибающиеся; у измеренных задержка штрафуется за нагрузку и ошибки
+        if self.latency is None:
+            return (False, self.in_use, self.error_rate)
+        return (True, self.latency * (1 + self.in_use) * (1 + 4 * self.error_rate))
+
+
+class ProxyPool:
+    """
+    Пул прокси с выбором самого быстрого здорового прокси.
+
+    Для каждого прокси ведется скользящее среднее задержки и доли ошибок,
+    а также число одновременных запросов. Прокси, у которого подряд
+    max_consecutive_failures ошибок или доля ошибок выше max_error_rate,
+    отправляется в карантин на quarantine_time секунд (предохранитель
+    размыкается), после чего получает один пробный запрос.
+    """
+
+    def __init__(self, proxies: list, max_error_rate: float = 0.5, max_consecutive_failures: int = 3,
+                 quarantine_time: float = 60.0, min_requests: int = 5, alpha: float = 0.3):
+        self.max_error_rate = max_error_rate
+        self.max_consecutive_failures = max_consecutive_failures
+        self.quarantine_time = quarantine_time
+        self.min_requests = min_requests
+        self.alpha = alpha
+        self._stats = {proxy: ProxyStats(proxy, CircuitBreaker(max_consecutive_failures, quarantine_time)) for proxy in proxies}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> 'ProxyPool':
+        """
+        Загружает прокси из настроек: proxy (через запятую или пробел) и proxy_file (по одному в строке).
+        """
+        proxies = (settings.get('proxy') or '').replace(',', ' ').split()
+        proxy_file = settings.get('proxy_file')
+        if proxy_file:
+            try:
+                with open(proxy_file, 'r', encoding='utf-8') as f:
+                    proxies += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+            except OSError as e:
+                print(f"Ошибка при загрузке прокси из файла '{proxy_file}': {e}")
+        return cls(list(dict.fromkeys(proxies)),
+                   quarantine_time=float(settings.get('proxy_quarantine') or 60.0))
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def acquire(self):
+        """
+        Выдает самый быстрый здоровый прокси и увеличивает его нагрузку.
+
+        Returns:
+            str: Прокси или None, если пул пуст.
+
+        Raises:
+            CircuitOpenError: Если все прокси в карантине.
+        """
+        if not self._stats:
+            return None
+        with self._lock:
+            healthy = [stats for stats in self._stats.values() if stats.breaker.available()]
+            if not healthy:
+                raise CircuitOpenError("Нет доступных прокси: все прокси в карантине")
+            best = min(healthy, key=ProxyStats.score)
+            best.breaker.allow()
+            best.in_use += 1
+            return best.proxy
+
+    def release(self, proxy: str, ok: bool, latency: float = None) -> None:
+        """
+        Возвращает прокси в пул и обновляет его статистику.
+        """
+        stats = self._stats.get(proxy)
+        if stats is None:
+            return
+        with self._lock:
+            stats.in_use = max(0, stats.in_use - 1)
+            stats.requests += 1
+            stats.error_rate += self.alpha * ((0.0 if ok else 1.0) - stats.error_rate)
+            if ok:
+                stats.breaker.record_success()
+                if latency is not None:
+                    stats.latency = latency if stats.latency is None else stats.latency + self.alpha * (latency - stats.latency)
+                return
+            opened = stats.breaker.record_failure()
+            if not opened and stats.requests >= self.min_requests and stats.error_rate > self.max_error_rate:
+                stats.breaker.trip()
+                opened = True
+            if opened:
+                stats.error_rate = 0.0
+                print(f"Прокси '{proxy}' отправлен в карантин на {self.quarantine_time:.0f} с.")
+
+    @contextmanager
+    def lease(self):
+        """
+        Выдает прокси на время запроса и по завершении записывает задержку или ошибку.
+        """
+        proxy = self.acquire()
+        started = time.monotonic()
+        try:
+            yield proxy
+        except Exception as e:
+            if isinstance(e, self.proxy_errors()):
+                self.release(proxy, False)
+            else:
+                self.release(proxy, True, time.monotonic() - started)
+            raise
+        self.release(proxy, True, time.monotonic() - started)
+
+    @staticmethod
+    def proxy_errors() -> tuple:
+        """
+        Ошибки, которые считаются проблемой прокси, а не ответа сервера.
+        """
+        import requests
+        return (requests.ConnectionError, requests.Timeout, OSError)
+
+    def stats(self) -> list:
+        with self._lock:
+            return [(stats.proxy, stats.latency, stats.error_rate, stats.in_use, stats.breaker.state != CircuitBreaker.CLOSED)
+                    for stats in self._stats.values()]
@@ -0,0 +1,29 @@
+"""
+Файл настроек key=value.
+"""
+from collections import defaultdict
+
+
+def read_settings(filename: str = 'settings.txt', settings=None):
+    """
+    Читает настройки из файла строк вида key=value.
+
+    Args:
+        filename (str): Имя файла настроек.
+        settings (dict): Куда добавить настройки; по умолчанию новый defaultdict.
+
+    Returns:
+        dict: Настройки.
+
+    Raises:
+        FileNotFoundError: Если файла нет.
+    """
+    if settings is None:
+        settings = defaultdict(lambda: None)
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and '=' in line:
+                key, value = line.split("=", 1)
+                settings[key] = value
+    return settings
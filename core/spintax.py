@@ -0,0 +1,345 @@
+"""
+Спинтакс: компиляция шаблонов, кэш и выдача уникальных вариантов.
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+
+class Spintax:
+    """
+    Скомпилированный шаблон спинтакса вида "{Привет|Здравствуйте}, {друг|{коллега|товарищ}}!".
+
+    Шаблон разбирается один раз: последовательность состоит из строк и
+    вариантов выбора, каждый вариант - снова последовательность. Соседние
+    строки склеиваются, а варианты из одних строк хранятся как кортеж
+    строк, поэтому генерация текста занимает микросекунды. Символы
+    "{", "}", "|" и "\\" можно экранировать обратной косой чертой.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.sequence = self._parse(template)
+        self._offsets = {}
+        self.combinations = self._sequence_count(self.sequence)
+
+    @staticmethod
+    def _parse(template: str) -> tuple:
+        stack = [[[]]]  # уровни: список вариантов, каждый вариант - список частей
+        text = []
+        escaped = False
+        for char in template:
+            if escaped:
+                text.append(char)
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '{':
+                Spintax._flush(stack, text)
+                stack.append([[]])
+            elif char == '|' and len(stack) > 1:
+                Spintax._flush(stack, text)
+                stack[-1].append([])
+            elif char == '}':
+                if len(stack) == 1:
+                    raise ValueError(f"Лишняя закрывающая скобка в спинтаксе: {template!r}")
+                Spintax._flush(stack, text)
+                options = []
+                for option in stack.pop():
+                    option = Spintax._compact(option)
+                    if not option:
+                        option = ''
+                    elif len(option) == 1 and isinstance(option[0], str):
+                        option = option[0]
+                    options.append(option)
+                stack[-1][-1].append(tuple(options))
+            else:
+                text.append(char)
+        if escaped:
+            text.append('\\')
+        if len(stack) != 1:
+            raise ValueError(f"Незакрытая скобка в спинтаксе: {template!r}")
+        Spintax._flush(stack, text)
+        return Spintax._compact(stack[0][0])
+
+    @staticmethod
+    def _flush(stack: list, text: list) -> None:
+        if text:
+            stack[-1][-1].append(''.join(text))
+            text.clear()
+
+    @staticmethod
+    def _compact(parts: list) -> tuple:
+        compact = []
+        for part in parts:
+            if isinstance(part, str) and compact and isinstance(compact[-1], str):
+                compact[-1] += part
+            elif part != '':
+                compact.append(part)
+        return tuple(compact)
+
+    def render(self, rng: random.Random = None) -> str:
+        """
+        Генерирует один случайный вариант текста.
+        """
+        out = []
+        self._render(self.sequence, (rng or random).random, out)
+        return ''.join(out)
+
+    @staticmethod
+    def _render(sequence: tuple, rand, out: list) -> None:
+        for part in sequence:
+            if part.__class__ is str:
+                out.append(part)
+            else:
+                option = part[int(rand() * len(part))]
+                if option.__class__ is str:
+                    out.append(option)
+                else:
+                    Spintax._render(option, rand, out)
+
+    def generate(self, count: int, rng: random.Random = None) -> list:
+        """
+        Генерирует count случайных вариантов текста.
+        """
+        rand = (rng or random).random
+        render = self._render
+        sequence = self.sequence
+        variants = []
+        for _ in range(count):
+            out = []
+            render(sequence, rand, out)
+            variants.append(''.join(out))
+        return variants
+
+    def _sequence_count(self, sequence: tuple) -> int:
+        count = 1
+        for part in sequence:
+            if part.__class__ is not str:
+                count *= self._choice_count(part)
+        return count
+
+    def _choice_count(self, choice: tuple) -> int:
+        offsets = [0]
+        for option in choice:
+            offsets.append(offsets[-1] + (1 if option.__class__ is str else self._sequence_count(option)))
+        self._offsets[id(choice)] = offsets
+        return offsets[-1]
+
+    def render_index(self, index: int) -> str:
+        """
+        Генерирует вариант текста по его номеру в смешанной системе счисления.
+
+        Args:
+            index (int): Номер варианта от 0 до combinations - 1.
+
+        Returns:
+            str: Текст варианта.
+        """
+        if not 0 <= index < self.combinations:
+            raise IndexError(f"Номер варианта {index} вне диапазона 0..{self.combinations - 1}")
+        out = []
+        self._render_sequence(self.sequence, index, out)
+        return ''.join(out)
+
+    def _render_sequence(self, sequence: tuple, index: int, out: list) -> None:
+        for part in sequence:
+            if part.__class__ is str:
+                out.append(part)
+                continue
+            offsets = self._offsets[id(part)]
+            index, digit = divmod(index, offsets[-1])
+            position = bisect_right(offsets, digit) - 1
+            option = part[position]
+            if option.__class__ is str:
+                out.append(option)
+            else:
+                self._render_sequence(option, digit - offsets[position], out)
+
+
+class SpintaxExhausted(Exception):
+    """
+    Все уникальные варианты спинтакса уже выданы.
+    """
+
+
+class DigestSet:
+    """
+    Компактное множество 64-битных хэшей текстов (открытая адресация в array('Q')).
+
+    Занимает 8 байт на ячейку и растёт удвоением, пока не достигнет
+    max_entries; после этого новые хэши не запоминаются.
+    """
+
+    def __init__(self, max_entries: int = 1 << 20):
+        self.max_entries = max_entries
+        self.size = 0
+        self.slots = array('Q', bytes(8 * 1024))
+
+    @staticmethod
+    def digest(text: str) -> int:
+        value = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+        return value or 1  # 0 обозначает пустую ячейку
+
+    def add(self, value: int) -> bool:
+        """
+        Добавляет хэш в множество.
+
+        Returns:
+            bool: False, если такой хэш уже был.
+        """
+        if self._find(value):
+            return False
+        if (self.size + 1) * 2 > len(self.slots):
+            if len(self.slots) // 2 >= self.max_entries:
+                return True
+            self._grow()
+        self._insert(value)
+        self.size += 1
+        return True
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.max_entries
+
+    def _find(self, value: int) -> bool:
+        slots = self.slots
+        mask = len(slots) - 1
+        position = value & mask
+        while slots[position]:
+            if slots[position] == value:
+                return True
+            position = (position + 1) & mask
+        return False
+
+    def _insert(self, value: int) -> None:
+        slots = self.slots
+        mask = len(slots) - 1
+        position = value & mask
+        while slots[position]:
+            position = (position + 1) & mask
+        slots[position] = value
+
+    def _grow(self) -> None:
+        old = self.slots
+        self.slots = array('Q', bytes(16 * len(old)))
+        for value in old:
+            if value:
+                self._insert(value)
+
+
+class SpintaxAllocator:
+    """
+    Выдаёт неповторяющиеся варианты спинтакса до исчерпания всех комбинаций.
+
+    Номера вариантов перебираются аффинной перестановкой (a * k + b) mod N
+    с gcd(a, N) = 1, поэтому каждый номер выдаётся ровно один раз без
+    хранения выданных номеров. Разные номера могут дать одинаковый текст
+    (например, "{a|a}"), такие повторы отсекаются множеством хэшей.
+    """
+
+    def __init__(self, spintax: Spintax, seed: int = None, max_tracked: int = 1 << 20, start: int = 0, stride: int = 1):
+        """
+        Args:
+            seed (int): Зерно перестановки; одинаковое зерно дает одинаковый порядок.
+            start (int): С какого номера в перестановке начинать.
+            stride (int): Шаг по перестановке; процессы с общим зерном и разными
+                start при stride = числу процессов выдают непересекающиеся варианты.
+        """
+        self.spintax = spintax
+        self.total = spintax.combinations
+        self.seed = random.randrange(1 << 63) if seed is None else seed
+        self.stride = stride
+        rng = random.Random(self.seed)
+        self.step = 1
+        if self.total > 1:
+            self.step = rng.randrange(1, self.total)
+            while math.gcd(self.step, self.total) != 1:
+                self.step = rng.randrange(1, self.total)
+        self.offset = rng.randrange(self.total)
+        self.position = start
+        self.issued = 0
+        self.duplicates = 0
+        self.seen = DigestSet(max_tracked)
+        self.lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.position >= self.total
+
+    @property
+    def remaining(self) -> int:
+        """
+        Сколько номеров комбинаций ещё не перебрано (верхняя граница числа новых текстов).
+        """
+        return self.total - self.position
+
+    def next(self) -> str:
+        """
+        Возвращает следующий уникальный вариант текста.
+
+        Raises:
+            SpintaxExhausted: Если все комбинации шаблона уже выданы.
+        """
+        with self.lock:
+            while self.position < self.total:
+                index = (self.step * self.position + self.offset) % self.total
+                self.position += self.stride
+                text = self.spintax.render_index(index)
+                if self.seen.add(DigestSet.digest(text)):
+                    self.issued += 1
+                    return text
+                self.duplicates += 1
+            raise SpintaxExhausted(f"Все {self.issued} уникальных вариантов спинтакса использованы.")
+
+
+_spintax_cache = OrderedDict()
+_spintax_cache_lock = threading.Lock()
+SPINTAX_CACHE_SIZE = 128
+
+
+def template_hash(template: str) -> str:
+    """
+    Хэш шаблона спинтакса: ключ кэша и сохраненного состояния распределителя.
+    """
+    return hashlib.sha1(template.encode('utf-8')).hexdigest()
+
+
+def compile_spintax(template: str) -> Spintax:
+    """
+    Возвращает скомпилированный спинтакс из кэша (ключ - хэш шаблона).
+    """
+    key = template_hash(template)
+    with _spintax_cache_lock:
+        spintax = _spintax_cache.get(key)
+        if spintax is not None:
+            _spintax_cache.move_to_end(key)
+            return spintax
+    spintax = Spintax(template)
+    with _spintax_cache_lock:
+        _spintax_cache[key] = spintax
+        while len(_spintax_cache) > SPINTAX_CACHE_SIZE:
+            _spintax_cache.popitem(last=False)
+    return spintax
+
+
+def benchmark_spintax(template: str, count: int = 100000) -> float:
+    """
+    Замеряет стоимость генерации одного варианта спинтакса.
+
+    Returns:
+        float: Среднее время на вариант в микросекундах.
+    """
+    started = time.perf_counter()
+    spintax = compile_spintax(template)
+    compiled = time.perf_counter()
+    spintax.generate(count)
+    finished = time.perf_counter()
+    per_variant = (finished - compiled) / count * 1e6
+    print(f"Спинтакс: компиляция {(compiled - started) * 1e6:.1f} мкс, {count} вариантов за {finished - compiled:.3f} с, {per_variant:.2f} мкс на вариант.")
+    return per_variant
@@ -0,0 +1,947 @@
+"""
+TaskManager: выполнение задач в потоках, asyncio или нескольких процессах.
+"""
+import itertools
+import os
+import queue
+import random
+import threading
+import time
+import urllib.parse
+from typing import TYPE_CHECKING
+
+from .accounts import AccountManager
+from .db import DEFAULT_AUDIENCE_CLAIM_TTL, STATUS_COLORS, DatabaseManager
+from .engine import AccountWriteError, AccountWriter, AudienceWriter, JobDeferred, SharedCounters, TaskEngine, TaskResult
+from .jobs import DEFAULT_LEASE_TTL, DEFAULT_TASK_TTL, AccountLease, JobQueue, TaskLease, new_owner
+from .limits import DEFAULT_SEND_RATE_GLOBAL, RateLimiter
+from .net import CircuitBreaker, CircuitOpenError, ProxyPool, RetryPolicy, SessionPool, format_account_url
+from .spintax import SpintaxAllocator, SpintaxExhausted, compile_spintax, template_hash
+
+if TYPE_CHECKING:
+    from .async_check import AsyncValidityChecker
+
+
+# Число рабочих потоков по типам задач и ключи настроек для их изменения
+DEFAULT_TASK_WORKERS = {
+    "Проверка валидности": 8,
+    "Парсинг аудитории": 4,
+    "Рассылка сообщений": 4,
+}
+TASK_WORKERS_SETTINGS = {
+    "Проверка валидности": 'workers_check',
+    "Парсинг аудитории": 'workers_parse',
+    "Рассылка сообщений": 'workers_send',
+}
+
+DEFAULT_PIPELINE_QUEUE_SIZE = 10000
+
+
+class TaskManager:
+    def __init__(self, db_file, account_manager, settings):
+        self.db_file = db_file
+        self.account_manager = account_manager
+        self.settings = settings
+        self.claim_batch_size = 100
+        self.session_pool = SessionPool(
+            max_size=int(settings.get('session_pool_size') or 500),
+            idle_timeout=float(settings.get('session_idle_timeout') or 300.0),
+        )
+        self._proxy_pool = None
+        self._rate_limiter = None
+        self._spintax_allocator = None
+        self.retry_policy = RetryPolicy.from_settings(settings)
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+        self.job_queue = JobQueue(account_manager.db_manager)
+        self._account_writer = None
+        self._account_writer_lock = threading.Lock()
+
+    @property
+    def proxy_pool(self) -> ProxyPool:
+        """
+        Пул прокси; создается из настроек при первом обращении.
+        """
+        if self._proxy_pool is None:
+            self._proxy_pool = ProxyPool.from_settings(self.settings)
+        return self._proxy_pool
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """
+        Ограничитель рассылки; общий для всех задач, создается из настроек при первом обращении.
+        """
+        if self._rate_limiter is None:
+            self._rate_limiter = RateLimiter.from_settings(self.settings)
+        return self._rate_limiter
+
+    @property
+    def account_writer(self) -> AccountWriter:
+        """
+        Фоновая запись статусов и счетчиков сообщений; общая для всех задач,
+        создается при первом обращении (настройки write_batch_size, write_interval).
+        """
+        with self._account_writer_lock:
+            if self._account_writer is None:
+                self._account_writer = AccountWriter(self.account_manager.db_manager,
+                                                     batch_size=int(self.settings.get('write_batch_size') or 500),
+                                                     interval=float(self.settings.get('write_interval') or 0.5))
+            return self._account_writer
+
+    def flush_account_updates(self) -> None:
+        """
+        Дожидается записи в базу изменений аккаунтов, накопленных AccountWriter.
+
+        Raises:
+            AccountWriteError: Если часть изменений не записана; задания этих
+                аккаунтов не должны фиксироваться как выполненные.
+        """
+        if self._account_writer is not None and not self._account_writer.flush():
+            raise AccountWriteError("Изменения аккаунтов не записаны в базу.")
+
+    def close(self) -> None:
+        """
+        Дописывает накопленные изменения аккаунтов и останавливает поток записи.
+        """
+        with self._account_writer_lock:
+            writer, self._account_writer = self._account_writer, None
+        if writer is not None:
+            writer.close()
+
+    def reload_settings(self) -> None:
+        """
+        Пересоздает пул прокси и ограничитель рассылки по текущим настройкам.
+        """
+        self._proxy_pool = ProxyPool.from_settings(self.settings)
+        self._rate_limiter = RateLimiter.from_settings(self.settings)
+        self.retry_policy = RetryPolicy.from_settings(self.settings)
+        with self._breakers_lock:
+            self._breakers.clear()
+
+    def workers_for(self, task_type: str) -> int:
+        """
+        Возвращает число рабочих потоков для типа задачи (из настроек или по умолчанию).
+        """
+        value = self.settings.get(TASK_WORKERS_SETTINGS.get(task_type, ''))
+        if value:
+            return max(1, int(value))
+        return DEFAULT_TASK_WORKERS.get(task_type, 1)
+
+    def run_task(self, accounts: list, task_type: str, table_name: str, audience_name: str = None, on_account_update=None,
+                 on_result=None, stop_event: threading.Event = None, counters: SharedCounters = None) -> TaskResult:
+        """
+        Выполняет задачу для списка аккаунтов в нескольких потоках.
+
+        Args:
+            accounts (list): Список словарей с данными аккаунтов.
+            task_type (str): Тип задачи.
+            table_name (str): Имя таблицы аккаунтов.
+            audience_name (str): Имя аудитории (по умолчанию совпадает с таблицей).
+            on_account_update (callable): Вызывается как on_account_update(account_id, changes)
+                после каждого изменения аккаунта.
+            on_result (callable): Вызывается как on_result(account, value) после обработки аккаунта.
+            stop_event (threading.Event): Событие остановки задачи.
+            counters (SharedCounters): Счетчики прогресса для режима processes.
+
+        Returns:
+            TaskResult: Сводные результаты по аккаунтам.
+        """
+        db_manager = self.account_manager.db_manager
+        audience_name = audience_name or table_name
+        stop_event = stop_event or threading.Event()
+
+        if self.settings.get('execution_mode') == 'processes':
+            return self.run_process_task(accounts, task_type, table_name, audience_name, on_account_update, on_result,
+                                         stop_event, counters)
+
+        # Аккаунты, арендованные другими задачами, пропускаются и возвращаются в result.skipped
+        db_manager.ensure_account_columns(table_name)
+        with AccountLease(db_manager, table_name, float(self.settings.get('lease_ttl') or DEFAULT_LEASE_TTL)) as lease:
+            leased = set(lease.acquire([account['id'] for account in accounts]))
+            skipped = [account['id'] for account in accounts if account['id'] not in leased]
+            if skipped:
+                print(f"Аккаунтов занято другими задачами: {len(skipped)}.")
+            try:
+                result = self._run_leased_task([account for account in accounts if account['id'] in leased], task_type,
+                                               table_name, audience_name, on_account_update, on_result, stop_event)
+            finally:
+                # Изменения записываются до снятия аренды и фиксации заданий в очереди
+                self.flush_account_updates()
+        result.skipped.extend(skipped)
+        return result
+
+    def _run_leased_task(self, accounts: list, task_type: str, table_name: str, audience_name: str, on_account_update,
+                         on_result, stop_event: threading.Event) -> TaskResult:
+        db_manager = self.account_manager.db_manager
+        account_manager = self.account_manager
+
+        if task_type == "Проверка валидности" and self.settings.get('execution_mode') == 'async':
+            if self.settings.get('check_endpoint'):
+                return self.run_async_check(accounts, table_name, on_account_update, on_result, stop_event)
+            # Без адреса проверки асинхронному режиму нечего запрашивать: проверка идет
+            # как в режиме потоков, по статусу в базе
+            print("Не задан check_endpoint: асинхронная проверка заменена обычной.")
+        if task_type == "Проверка валидности":
+            def handler(account, state):
+                return self.check_account(account_manager, table_name, account, on_account_update)
+        elif task_type == "Парсинг и рассылка":
+            return self.run_pipeline_task(accounts, table_name, audience_name, on_account_update, on_result, stop_event)
+        elif task_type == "Парсинг аудитории":
+            def handler(account, state):
+                return self.parse_audience(db_manager, audience_name, [account])
+        elif task_type == "Рассылка сообщений":
+            claimed = []
+            claim_lock = threading.Lock()
+            claim_owner = new_owner()
+            writer = AudienceWriter(db_manager, audience_name, claim_owner, self.audience_claim_ttl)
+            db_manager.ensure_account_columns(table_name)
+            self.rate_limiter.load_accounts(accounts)
+
+            def handler(account, state):
+                if not self.rate_limiter.acquire(account, stop_event):
+                    if stop_event.is_set():
+                        raise JobDeferred("Задача остановлена")
+                    # Квота восстановится завтра: задание ждет следующего запуска, попытка не тратится
+                    raise JobDeferred("Дневная квота аккаунта исчерпана", retry=False)
+                audience_id = self.next_audience_id(db_manager, audience_name, claimed, claim_lock, claim_owner)
+                if audience_id is None:
+                    print("Неиспользованные ID аудитории закончились.")
+                    self.rate_limiter.refund(account)
+                    stop_event.set()
+                    raise JobDeferred("Аудитория закончилась")
+                try:
+                    sent = self.send_message(account_manager, table_name, account, audience_id, on_account_update)
+                except SpintaxExhausted as e:
+                    # Тексты закончились: задача останавливается, аккаунт не теряет попытку
+                    with claim_lock:
+                        claimed.append(audience_id)
+                    self.rate_limiter.refund(account)
+                    stop_event.set()
+                    raise JobDeferred(str(e)) from e
+                except BaseException:
+                    # Сообщение не отправлено: ID возвращается в буфер и достанется следующему аккаунту,
+                    # токены и квота - ограничителю
+                    with claim_lock:
+                        claimed.append(audience_id)
+                    self.rate_limiter.refund(account)
+                    raise
+                writer.add_sent(audience_id)
+                return sent
+        else:
+            print(f"Неизвестный тип задачи: {task_type}")
+            return TaskResult(len(accounts))
+
+        def cleanup(state):
+            db_manager.release()
+
+        engine = TaskEngine(self.workers_for(task_type))
+        try:
+            result = engine.run(accounts, handler, on_result, stop_event, cleanup)
+        finally:
+            if task_type == "Рассылка сообщений":
+                writer.close()
+                db_manager.release_audience_ids(audience_name, claimed)
+                db_manager.release()
+        print(f"Задача '{task_type}' завершена: обработано {result.processed}, успешно {result.succeeded}, ошибок {result.failed}.")
+        return result
+
+    @property
+    def task_ttl(self) -> float:
+        """
+        Через сколько секунд без отметки владельца задача считается брошенной (настройка task_ttl).
+        """
+        return float(self.settings.get('task_ttl') or DEFAULT_TASK_TTL)
+
+    def run_queued_task(self, task_id: int, on_account_update=None, on_result=None, stop_event: threading.Event = None,
+                        counters: SharedCounters = None, owner: str = None) -> TaskResult:
+        """
+        Выполняет (или продолжает) задачу из очереди заданий.
+
+        Задания берутся пачками по job_batch_size, после каждой пачки
+        результаты фиксируются в базе. Незавершенные задания прошлых
+        запусков возвращаются в очередь. Задания по аккаунтам, арендованным
+        другими задачами, откладываются до конца очереди и повторяются
+        раз в lease_retry секунд.
+        Когда заканчиваются тексты спинтакса, задача останавливается, а
+        невыполненные задания остаются в очереди без траты попыток. Задания
+        аккаунтов с исчерпанной дневной квотой ждут следующего запуска.
+
+        Задача выполняется под TaskLease: если у нее есть живой владелец
+        (другое окно или демон), она не запускается. Владелец, не
+        отмечавшийся дольше task_ttl секунд, считается завершившимся.
+
+        Args:
+            owner (str): Владелец, уже захвативший задачу (JobQueue.claim_task).
+
+        Returns:
+            TaskResult: Результаты этого запуска.
+        """
+        job_queue = self.job_queue
+        db_manager = self.account_manager.db_manager
+        task = job_queue.get_task(task_id)
+        if task is None:
+            print(f"Задача #{task_id} не найдена.")
+            return TaskResult()
+        # Задача останавливает себя (закончились аудитория или тексты) своим событием,
+        # а не общим событием вызывающего, чтобы демон не останавливался вместе с ней
+        outer_stop, stop_event = stop_event, threading.Event()
+
+        def watch_stop():
+            while not stop_event.is_set():
+                if outer_stop.wait(0.1):
+                    stop_event.set()
+
+        lease = TaskLease(job_queue, task_id, self.task_ttl, owner)
+        if not lease.acquire():
+            print(f"Задача #{task_id} уже выполняется другим процессом.")
+            return TaskResult()
+        # Задания, оставшиеся в работе у завершившегося владельца, возвращаются в очередь
+        job_queue.recover(task_id)
+        if outer_stop is not None:
+            threading.Thread(target=watch_stop, daemon=True).start()
+        try:
+            with lease:
+                if self.settings.get('execution_mode') == 'processes':
+                    pending = job_queue.counts(task_id).get('pending', 0)
+                    return self.run_process_task(None, task['task_type'], task['table_name'], task['audience_name'],
+                                                 on_account_update, on_result, stop_event, counters, task_id, pending)
+                return self.run_queued_jobs(task, on_account_update, on_result, stop_event, counters)
+        finally:
+            stop_event.set()
+            job_queue.recover(task_id)
+            counts = job_queue.counts(task_id)
+            lease.release('stopped' if counts.get('pending') else 'done')
+            db_manager.release()
+
+    def run_queued_jobs(self, task: dict, on_account_update=None, on_result=None, stop_event: threading.Event = None,
+                        counters: SharedCounters = None) -> TaskResult:
+        """
+        Берет задания задачи из очереди пачками, пока они не кончатся, и выполняет их run_task.
+
+        Владение задачей не проверяется: вызывается из run_queued_task и из
+        рабочих процессов, которые разбирают одну очередь.
+        """
+        job_queue = self.job_queue
+        db_manager = self.account_manager.db_manager
+        task_id = task['id']
+        stop_event = stop_event or threading.Event()
+        batch_size = int(self.settings.get('job_batch_size') or 500)
+        lease_retry = float(self.settings.get('lease_retry') or 5.0)
+        allocator = self.spintax_allocator if task['task_type'] in ("Рассылка сообщений", "Парсинг и рассылка") else None
+        total = TaskResult()
+        deferred = []
+        postponed = []
+        while not stop_event.is_set():
+            if allocator is not None and allocator.exhausted:
+                print("Уникальные варианты спинтакса закончились, задача остановлена.")
+                stop_event.set()
+                break
+            account_ids = job_queue.dequeue(task_id, batch_size)
+            if not account_ids:
+                if not deferred or stop_event.wait(lease_retry):
+                    break
+                job_queue.requeue(task_id, deferred)
+                deferred = []
+                continue
+            accounts = db_manager.get_accounts_by_ids(task['table_name'], account_ids)
+            processed = {}
+
+            def handle_result(account, value):
+                processed[account['id']] = value
+                if on_result:
+                    on_result(account, value)
+
+            result = self.run_task(accounts, task['task_type'], task['table_name'], task['audience_name'],
+                                   on_account_update, handle_result, stop_event, counters)
+            job_queue.checkpoint(task_id, [(account_id, bool(value), result.errors.get(account_id))
+                                           for account_id, value in processed.items()])
+            self.save_spintax_position(db_manager)
+            total.processed += result.processed
+            total.succeeded += result.succeeded
+            total.failed += result.failed
+            total.errors.update(result.errors)
+            deferred.extend(result.skipped)
+            postponed.extend(result.postponed)
+            # Аккаунты, удаленные из таблицы, не должны оставаться в работе
+            missing = set(account_ids) - {account['id'] for account in accounts}
+            job_queue.checkpoint(task_id, [(account_id, False, "Аккаунт не найден") for account_id in missing])
+            # Задания, до которых остановленная задача не дошла, попытку не тратят
+            waiting = set(result.skipped) | set(result.postponed)
+            job_queue.requeue(task_id, [account['id'] for account in accounts
+                                        if account['id'] not in processed and account['id'] not in waiting])
+        # Отложенные задания возвращаются в очередь без траты попытки: отложенные
+        # до следующего запуска (дневная квота) и оставшиеся после остановки
+        job_queue.requeue(task_id, deferred + postponed)
+        return total
+
+    def process_count(self, accounts: int) -> int:
+        """
+        Число рабочих процессов (настройка processes, по умолчанию - число ядер).
+        """
+        processes = int(self.settings.get('processes') or os.cpu_count() or 1)
+        return max(1, min(processes, accounts))
+
+    def run_process_task(self, accounts: list, task_type: str, table_name: str, audience_name: str = None,
+                         on_account_update=None, on_result=None, stop_event: threading.Event = None,
+                         counters: SharedCounters = None, task_id: int = None, pending: int = 0) -> TaskResult:
+        """
+        Выполняет задачу в нескольких процессах, разделив аккаунты между ними.
+
+        Каждый процесс открывает свое соединение с базой и выполняет свою часть
+        аккаунтов обычным run_task; изменения аккаунтов и результаты приходят
+        через очередь пачками и передаются в on_account_update/on_result в этом
+        процессе. Прогресс процессы пишут в counters (если передан), его можно
+        опрашивать по таймеру, не дожидаясь сообщений. Общая скорость рассылки
+        делится между процессами поровну.
+
+        Если передан task_id (вместо accounts), процессы запускаются один раз
+        на всю задачу и сами разбирают ее очередь заданий (run_queued_jobs),
+        а не стартуют заново для каждой пачки.
+
+        Args:
+            task_id (int): Задача из очереди, уже захваченная вызывающим.
+            pending (int): Число заданий в очереди (для выбора числа процессов).
+        """
+        size = len(accounts) if task_id is None else pending
+        result = TaskResult(size)
+        if not size:
+            return result
+        stop_event = stop_event or threading.Event()
+        import multiprocessing
+        context = multiprocessing.get_context('spawn')
+        processes = self.process_count(size)
+        if counters is not None:
+            processes = min(processes, counters.slots)
+        results = context.Queue()
+        process_stop = context.Event()
+        settings = dict(self.settings)
+        settings['execution_mode'] = 'threads'
+        settings['send_rate_global'] = float(settings.get('send_rate_global') or DEFAULT_SEND_RATE_GLOBAL) / processes
+        allocator = self.spintax_allocator if task_type in ("Рассылка сообщений", "Парсинг и рассылка") else None
+        spintax = (allocator.seed, allocator.position) if allocator else None
+
+        workers = []
+        for index in range(processes):
+            worker = context.Process(target=_process_task_worker, daemon=True,
+                                     args=(self.db_file, settings, task_type, table_name, audience_name,
+                                           accounts[index::processes] if task_id is None else None, index, processes,
+                                           spintax, results, process_stop, counters.name if counters else None,
+                                           counters.slots if counters else 0, task_id))
+            worker.start()
+            workers.append(worker)
+
+        running = processes
+        while running:
+            if stop_event.is_set():
+                process_stop.set()
+            try:
+                message = results.get(timeout=0.1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    print("Рабочие процессы завершились без отчета.")
+                    break
+                continue
+            kind = message[0]
+            if kind == 'batch':
+                if on_account_update:
+                    for account_id, changes in message[1]:
+                        on_account_update(account_id, changes)
+                if on_result:
+                    for account, value in message[2]:
+                        on_result(account, value)
+            elif kind == 'done':
+                _, processed, succeeded, failed, errors, skipped, position = message
+                result.processed += processed
+                result.succeeded += succeeded
+                result.failed += failed
+                result.errors.update(errors)
+                result.skipped.extend(skipped)
+                if allocator and position is not None:
+                    allocator.position = max(allocator.position, position)
+                running -= 1
+
+        for worker in workers:
+            worker.join(timeout=5)
+        print(f"Задача '{task_type}' в {processes} процессах завершена: обработано {result.processed}, успешно {result.succeeded}, ошибок {result.failed}.")
+        return result
+
+    def async_checker(self) -> 'AsyncValidityChecker':
+        """
+        Создает асинхронный проверяющий по настройкам (check_endpoint, check_concurrency,
+        check_per_host, check_timeout). Требует заданного check_endpoint.
+
+        Повторы, предохранители хостов и пул прокси общие с потоковым режимом (request).
+        """
+        from .async_check import AsyncValidityChecker
+        return AsyncValidityChecker(
+            self.settings['check_endpoint'],
+            concurrency=int(self.settings.get('check_concurrency') or 1000),
+            per_host_limit=int(self.settings.get('check_per_host') or 100),
+            timeout=float(self.settings.get('check_timeout') or 10.0),
+            retry_policy=self.retry_policy,
+            breaker_for=self.endpoint_breaker,
+            proxy_pool=self.proxy_pool,
+        )
+
+    def run_async_check(self, accounts: list, table_name: str, on_account_update=None, on_result=None,
+                        stop_event: threading.Event = None, checker: 'AsyncValidityChecker' = None) -> TaskResult:
+        """
+        Проверяет валидность аккаунтов в режиме asyncio и пишет статусы в базу пачками.
+        """
+        db_manager = self.account_manager.db_manager
+        checker = checker or self.async_checker()
+        result = TaskResult(len(accounts))
+        pending = []
+
+        def flush():
+            db_manager.set_account_statuses(table_name, pending)
+            pending.clear()
+
+        def handle(account, status, error):
+            if isinstance(error, CircuitOpenError):
+                # Как в TaskEngine: проверка откладывается без траты попытки
+                result.skip(account)
+                return
+            if error is not None:
+                result.add_error(account, error)
+            else:
+                result.add(account, status)
+                pending.append((account['id'], status))
+                if on_account_update:
+                    on_account_update(account['id'], {'status_account': status, 'color': STATUS_COLORS.get(status, '')})
+                if len(pending) >= 500:
+                    flush()
+            if on_result:
+                on_result(account, status)
+
+        try:
+            checker.run(accounts, handle, stop_event)
+            flush()
+        finally:
+            db_manager.release()
+        print(f"Асинхронная проверка завершена: обработано {result.processed}, успешно {result.succeeded}, ошибок {result.failed}.")
+        return result
+
+    def check_account(self, account_manager: AccountManager, table_name: str, account: dict, on_account_update=None):
+        status = self.http_check(account) if self.settings.get('check_endpoint') else None
+        status = status or account_manager.db_manager.check_account_status(account)
+        self.account_writer.set_status(table_name, account['id'], status)
+        changes = {'status_account': status, 'color': STATUS_COLORS.get(status, '')}
+        if on_account_update:
+            on_account_update(account['id'], changes)
+        return changes
+
+    def parse_audience(self, db_manager: DatabaseManager, audience_name: str, accounts: list) -> list:
+        audience_ids = []
+        for account in accounts:
+            audience_ids.extend(self.fetch_audience(account))
+        db_manager.add_audience_ids(audience_name, audience_ids)
+        return audience_ids
+
+    def fetch_audience(self, account: dict) -> list:
+        """
+        Получает ID аудитории от одного аккаунта (временная функция).
+        """
+        time.sleep(0.01)
+        return [random.randint(10000, 100000)]
+
+    def run_pipeline_task(self, accounts: list, table_name: str, audience_name: str, on_account_update=None,
+                          on_result=None, stop_event: threading.Event = None) -> TaskResult:
+        """
+        Парсит аудиторию и сразу рассылает по ней сообщения.
+
+        Потоки-парсеры (workers_parse) передают найденные ID в AudienceWriter
+        и не ждут базу. Поток записи добавляет их в аудиторию пачками сразу
+        зарезервированными за задачей и кладет в ограниченную очередь
+        (pipeline_queue_size) только ID, которых в аудитории еще не было,
+        поэтому повторный запуск, следующая пачка заданий или другой аккаунт
+        с пересекающейся аудиторией не отправят сообщение тому же ID.
+        Потоки-отправители (workers_send) забирают ID из очереди и отправляют
+        по очереди от аккаунтов задачи с учетом ограничителя рассылки;
+        отправленные ID помечаются used = 1 тем же потоком записи. Неотправленные
+        ID при завершении возвращаются в аудиторию неиспользованными, а после
+        сбоя - когда истечет их резерв.
+
+        on_result вызывается после парсинга каждого аккаунта со словарем
+        {'found': список найденных ID}; парсинг успешен независимо от того,
+        нашлись ли ID.
+        """
+        db_manager = self.account_manager.db_manager
+        stop_event = stop_event or threading.Event()
+        ids_queue = queue.Queue(maxsize=int(self.settings.get('pipeline_queue_size') or DEFAULT_PIPELINE_QUEUE_SIZE))
+        parsing_done = threading.Event()
+        unsent = []
+        unsent_lock = threading.Lock()
+        found = [0]
+        db_manager.ensure_account_columns(table_name)
+        self.rate_limiter.load_accounts(accounts)
+        senders = itertools.cycle(accounts)
+        exhausted = set()
+        sender_lock = threading.Lock()
+        sent = [0]
+
+        def give_back(audience_id):
+            with unsent_lock:
+                unsent.append(audience_id)
+
+        def enqueue_new(new_ids):
+            # Вызывается из потока записи: новые для аудитории ID идут отправителям
+            found[0] += len(new_ids)
+            for audience_id in new_ids:
+                while True:
+                    if stop_event.is_set():
+                        give_back(audience_id)
+                        break
+                    try:
+                        ids_queue.put(audience_id, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+
+        writer = AudienceWriter(db_manager, audience_name, new_owner(), self.audience_claim_ttl, enqueue_new)
+
+        def parse(account, state):
+            audience_ids = self.fetch_audience(account)
+            writer.add_parsed(audience_ids)
+            return {'found': audience_ids}
+
+        def next_sender():
+            # Аккаунт с исчерпанной дневной квотой пропускается; None - квоты исчерпаны у всех
+            with sender_lock:
+                for _ in range(len(accounts)):
+                    account = next(senders)
+                    if account['id'] not in exhausted:
+                        return account
+            return None
+
+        def send():
+            try:
+                while not stop_event.is_set():
+                    try:
+                        audience_id = ids_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if parsing_done.is_set():
+                            break
+                        continue
+                    while not stop_event.is_set():
+                        account = next_sender()
+                        if account is None:
+                            print("Дневные квоты всех аккаунтов исчерпаны.")
+                            stop_event.set()
+                            give_back(audience_id)
+                            break
+                        if not self.rate_limiter.acquire(account, stop_event):
+                            if stop_event.is_set():
+                                give_back(audience_id)
+                            else:
+                                with sender_lock:
+                                    exhausted.add(account['id'])
+                            continue
+                        try:
+                            try:
+                                self.send_message(self.account_manager, table_name, account, audience_id, on_account_update)
+                            except BaseException:
+                                # Сообщение не отправлено: токены и квота возвращаются ограничителю
+                                self.rate_limiter.refund(account)
+                                raise
+                            writer.add_sent(audience_id)
+                            with sender_lock:
+                                sent[0] += 1
+                        except CircuitOpenError as e:
+                            # Цель временно отключена: ID возвращается в очередь (или в базу
+                            # неиспользованным), отправитель делает паузу
+                            print(f"Отправка отложена: {e}")
+                            try:
+                                ids_queue.put_nowait(audience_id)
+                            except queue.Full:
+                                give_back(audience_id)
+                            stop_event.wait(1.0)
+                        except SpintaxExhausted:
+                            give_back(audience_id)
+                            stop_event.set()
+                        except Exception as e:
+                            print(f"Ошибка при отправке сообщения: {e}")
+                            give_back(audience_id)
+                        break
+            finally:
+                db_manager.release()
+
+        threads = [threading.Thread(target=send, daemon=True) for _ in range(self.workers_for("Рассылка сообщений"))]
+        for thread in threads:
+            thread.start()
+        try:
+            engine = TaskEngine(self.workers_for("Парсинг аудитории"))
+            result = engine.run(accounts, parse, on_result, stop_event, lambda state: db_manager.release())
+        finally:
+            # Найденные последними ID передаются отправителям до сигнала о конце парсинга
+            writer.flush()
+            parsing_done.set()
+            for thread in threads:
+                thread.join()
+            writer.close()
+            # ID, оставшиеся в очереди после остановки, достанутся следующей рассылке
+            while True:
+                try:
+                    unsent.append(ids_queue.get_nowait())
+                except queue.Empty:
+                    break
+            db_manager.release_audience_ids(audience_name, unsent)
+            db_manager.release()
+        print(f"Конвейер завершен: обработано аккаунтов {result.processed}, новых ID {found[0]}, отправлено сообщений {sent[0]}.")
+        return result
+
+    @property
+    def audience_claim_ttl(self) -> float:
+        """
+        Срок резерва ID аудитории в секундах (настройка audience_claim_ttl).
+        """
+        return float(self.settings.get('audience_claim_ttl') or DEFAULT_AUDIENCE_CLAIM_TTL)
+
+    def next_audience_id(self, db_manager: DatabaseManager, audience_name: str, claimed: list, lock: threading.Lock = None,
+                         owner: str = None):
+        """
+        Возвращает следующий ID аудитории из буфера, дозаполняя его пачкой из базы.
+
+        ID в буфере зарезервированы за owner (резервы продлевает AudienceWriter задачи).
+
+        Args:
+            claimed (list): Буфер зарезервированных ID аудитории (общий для потоков задачи).
+            lock (threading.Lock): Блокировка буфера, если он общий.
+            owner (str): Владелец резервов задачи.
+
+        Returns:
+            ID аудитории или None, если неиспользованные ID закончились.
+        """
+        if lock is not None:
+            with lock:
+                return self.next_audience_id(db_manager, audience_name, claimed, owner=owner)
+        if not claimed:
+            claimed.extend(db_manager.claim_audience_ids(audience_name, self.claim_batch_size, owner, self.audience_claim_ttl))
+            if not claimed:
+                return None
+        return claimed.pop()
+
+    def send_message(self, account_manager: AccountManager, table_name: str, account: dict, audience_id, on_account_update=None) -> bool:
+        """
+        Отправляет одно сообщение от аккаунта указанному ID аудитории.
+
+        Счетчики сообщений записываются AccountWriter; on_account_update получает
+        их новые значения после записи.
+        """
+        if self.settings.get('send_endpoint'):
+            self.http_send(account, audience_id)
+        self.account_writer.add_messages(table_name, account['id'], 1, on_account_update)
+        return True
+
+    def endpoint_breaker(self, url: str) -> CircuitBreaker:
+        """
+        Предохранитель хоста эндпоинта (breaker_threshold ошибок подряд, breaker_reset секунд).
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        with self._breakers_lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(int(self.settings.get('breaker_threshold') or 5),
+                                                                float(self.settings.get('breaker_reset') or 30.0))
+            return breaker
+
+    def request(self, method: str, url: str, account: dict, timeout: float, **kwargs):
+        """
+        Выполняет запрос от аккаунта с повторами и предохранителями.
+
+        Временные сбои (соединение, таймаут, 429/5xx) повторяются по
+        retry_policy, каждый раз через новый прокси из пула. Если
+        предохранитель эндпоинта разомкнут, запрос сразу отклоняется.
+
+        Returns:
+            requests.Response: Последний полученный ответ.
+
+        Raises:
+            CircuitOpenError: Если эндпоинт или все прокси временно отключены.
+        """
+        import requests
+        breaker = self.endpoint_breaker(url)
+        policy = self.retry_policy
+        for attempt in range(policy.attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Эндпоинт '{urllib.parse.urlsplit(url).netloc}' временно отключен после серии ошибок")
+            try:
+                with self.proxy_pool.lease() as proxy:
+                    session = self.session_pool.get(account, proxy)
+                    response = session.request(method, url, timeout=timeout, **kwargs)
+            except requests.RequestException as e:
+                if breaker.record_failure():
+                    print(f"Эндпоинт '{urllib.parse.urlsplit(url).netloc}' отключен на {breaker.reset_timeout:g} с.")
+                if not policy.is_transient(e) or attempt == policy.attempts - 1:
+                    raise
+            except BaseException:
+                # Запрос не дошел до эндпоинта (например, все прокси отключены): результата для предохранителя нет
+                breaker.release_probe()
+                raise
+            else:
+                if not policy.is_transient(response=response):
+                    breaker.record_success()
+                    return response
+                if breaker.record_failure():
+                    print(f"Эндпоинт '{urllib.parse.urlsplit(url).netloc}' отключен на {breaker.reset_timeout:g} с.")
+                if attempt == policy.attempts - 1:
+                    return response
+            time.sleep(policy.delay(attempt))
+
+    def http_check(self, account: dict) -> str:
+        """
+        Проверяет аккаунт запросом на check_endpoint через сессию аккаунта.
+        """
+        response = self.request('GET', format_account_url(self.settings['check_endpoint'], account), account,
+                                float(self.settings.get('check_timeout') or 10.0))
+        if response.status_code == 200:
+            return "Валидный"
+        if response.status_code in (401, 403, 404):
+            return "Невалидный"
+        response.raise_for_status()
+        raise RuntimeError(f"Неожиданный ответ сервера: {response.status_code}")
+
+    @property
+    def spintax_allocator(self):
+        """
+        Распределитель уникальных вариантов спинтакса; пересоздается при смене шаблона.
+
+        Зерно и позиция берутся из базы по хэшу шаблона, поэтому новый запуск
+        продолжает перестановку с места, сохраненного save_spintax_position.
+        """
+        template = self.settings.get('spintax')
+        if not template:
+            return None
+        allocator = self._spintax_allocator
+        if allocator is None or allocator.spintax.template != template:
+            state = self.account_manager.db_manager.load_spintax_state(template_hash(template), random.randrange(1 << 63))
+            seed, position = state or (None, 0)
+            allocator = SpintaxAllocator(compile_spintax(template), seed, start=position)
+            self._spintax_allocator = allocator
+        return allocator
+
+    def save_spintax_position(self, db_manager: DatabaseManager) -> None:
+        """
+        Сохраняет позицию распределителя спинтакса (после контрольной точки заданий).
+        """
+        allocator = self._spintax_allocator
+        if allocator is not None and allocator.issued:
+            db_manager.advance_spintax_state(template_hash(allocator.spintax.template), allocator.position)
+
+    def message_text(self) -> str:
+        """
+        Выдает уникальный текст сообщения из спинтакса в настройках.
+
+        Raises:
+            SpintaxExhausted: Если уникальные варианты закончились.
+        """
+        allocator = self.spintax_allocator
+        if allocator is None:
+            return ''
+        try:
+            return allocator.next()
+        except SpintaxExhausted as e:
+            print(f"Ошибка при генерации текста: {e}")
+            raise
+
+    def http_send(self, account: dict, audience_id) -> None:
+        """
+        Отправляет сообщение запросом на send_endpoint через сессию аккаунта.
+        """
+        response = self.request('POST', self.settings['send_endpoint'], account, float(self.settings.get('send_timeout') or 10.0),
+                                data={'audience_id': audience_id, 'text': self.message_text()})
+        response.raise_for_status()
+
+
+PROCESS_BATCH_SIZE = 500
+PROCESS_BATCH_INTERVAL = 0.2
+
+
+def _process_task_worker(db_file: str, settings: dict, task_type: str, table_name: str, audience_name: str, accounts: list,
+                         index: int, processes: int, spintax, results, stop_event, counters_name: str = None,
+                         counters_slots: int = 0, task_id: int = None) -> None:
+    """
+    Точка входа рабочего процесса TaskManager.run_process_task.
+
+    Изменения аккаунтов и результаты копятся и отправляются пачками не реже
+    PROCESS_BATCH_INTERVAL секунд, а прогресс сразу пишется в свою строку
+    разделяемых счетчиков.
+
+    Args:
+        spintax: (зерно, позиция) распределителя спинтакса родительского процесса или None.
+        results: Очередь сообщений в родительский процесс.
+        counters_name (str): Имя блока SharedCounters или None.
+        task_id (int): Задача, очередь которой разбирает процесс (тогда accounts равен None).
+    """
+    counters = SharedCounters(counters_slots, counters_name) if counters_name else None
+    updates = []
+    outcomes = []
+    batch_lock = threading.Lock()
+    last_flush = [time.monotonic()]
+
+    def flush(force: bool = False):
+        with batch_lock:
+            if not updates and not outcomes:
+                return
+            if not force and len(updates) + len(outcomes) < PROCESS_BATCH_SIZE \
+                    and time.monotonic() - last_flush[0] < PROCESS_BATCH_INTERVAL:
+                return
+            batch = ('batch', updates[:], outcomes[:])
+            updates.clear()
+            outcomes.clear()
+            last_flush[0] = time.monotonic()
+        results.put(batch)
+
+    def handle_update(account_id, changes):
+        with batch_lock:
+            updates.append((account_id, changes))
+        flush()
+
+    def handle_result(account, value):
+        if counters is not None:
+            counters.increment(index, 'processed')
+            counters.increment(index, 'succeeded' if value else 'failed')
+            if value and task_type == "Рассылка сообщений":
+                counters.increment(index, 'sent')
+        with batch_lock:
+            outcomes.append((account, value))
+        flush()
+
+    db_manager = DatabaseManager(db_file, float(settings.get('db_busy_timeout') or 5.0))
+    task_manager = TaskManager(db_file, AccountManager(db_manager), settings)
+    task_manager.claim_batch_size = max(1, task_manager.claim_batch_size // processes)
+    # run_task сам ставит событие остановки, когда закончилась аудитория; это не должно
+    # останавливать остальные процессы, поэтому общее событие только читается.
+    local_stop = threading.Event()
+
+    def watch_stop():
+        while not local_stop.is_set():
+            if stop_event.wait(0.1):
+                local_stop.set()
+
+    threading.Thread(target=watch_stop, daemon=True).start()
+    allocator = None
+    if spintax and settings.get('spintax'):
+        seed, position = spintax
+        allocator = SpintaxAllocator(compile_spintax(settings['spintax']), seed, start=position + index, stride=processes)
+        task_manager._spintax_allocator = allocator
+    try:
+        if task_id is None:
+            result = task_manager.run_task(accounts, task_type, table_name, audience_name,
+                                           handle_update, handle_result, local_stop)
+        else:
+            result = task_manager.run_queued_jobs(task_manager.job_queue.get_task(task_id), handle_update, handle_result,
+                                                  local_stop)
+        flush(force=True)
+        results.put(('done', result.processed, result.succeeded, result.failed, result.errors, result.skipped,
+                     allocator.position if allocator else None))
+    except Exception as e:
+        print(f"Ошибка в рабочем процессе {index}: {e}")
+        flush(force=True)
+        results.put(('done', 0, 0, 0, {}, [], None))
+    finally:
+        local_stop.set()
+        task_manager.close()
+        db_manager.close()
+        if counters is not None:
+            counters.close()
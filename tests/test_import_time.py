@@ -0,0 +1,50 @@
+"""
+Проверка, что пакет core импортируется быстро и не тянет тяжелые зависимости.
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет на import core + from core import TaskManager (секунды)
+IMPORT_BUDGET = 0.5
+
+# Модули, которые должны загружаться только при первом использовании
+HEAVY_MODULES = ('PyQt5', 'requests', 'asyncio', 'multiprocessing', 'aiohttp')
+
+SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import core
+from core import TaskManager
+elapsed = time.perf_counter() - started
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(name for name in sys.modules if name.split('.')[0] in %r)}))
+"""
+
+
+def run_import(*args: str) -> dict:
+    output = subprocess.run([sys.executable, *args, '-c', SCRIPT % (HEAVY_MODULES,)], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_import_within_budget():
+    # Лучший из трех запусков, чтобы не зависеть от холодного кэша диска
+    elapsed = min(run_import()['elapsed'] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f"import core занял {elapsed:.3f} с (бюджет {IMPORT_BUDGET} с)"
+
+
+def test_import_skips_heavy_modules():
+    assert run_import()['modules'] == []
+
+
+def test_importtime_report():
+    # -X importtime пишет время импорта каждого модуля в stderr (кроме загруженных
+    # через importlib.import_module, как сам core.tasks, но его зависимости видны)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import core; from core import TaskManager'],
+                            cwd=ROOT, check=True, capture_output=True, text=True)
+    imported = {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if '|' in line}
+    assert 'core.db' in imported
+    assert not any(name.split('.')[0] in HEAVY_MODULES for name in imported)